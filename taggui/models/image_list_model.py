@@ -1,33 +1,255 @@
+import os
 import random
+import time
 from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
 from dataclasses import dataclass
+from functools import cache
 from pathlib import Path
 
-import exifread
-import imagesize
-from PySide6.QtCore import (QAbstractListModel, QModelIndex, QSize, Qt, Signal,
-                            Slot)
-from PySide6.QtGui import QIcon, QImageReader, QPixmap
+from PySide6.QtCore import (QAbstractListModel, QModelIndex, QSize, Qt,
+                            QThread, QThreadPool, QTimer, Signal, Slot)
+from PySide6.QtGui import (QIcon, QImage, QImageIOHandler, QImageReader,
+                           QPixmap)
 from PySide6.QtWidgets import QMessageBox
 
 from utils.image import Image
+from utils.thumbnail_cache import ThumbnailCache
+from utils.thumbnail_loader import ThumbnailLoader, ThumbnailLoaderSignals
 from utils.utils import get_confirmation_dialog_reply
 
 UNDO_STACK_SIZE = 32
+IMAGE_LOADING_THREAD_COUNT = min(32, (os.cpu_count() or 1) * 4)
+# The minimum number of seconds between adding batches of loaded images to
+# the image list.
+IMAGE_BATCH_INTERVAL = 0.1
+# The number of bytes read from a text file at a time.
+TEXT_FILE_READ_SIZE = 64 * 1024
+# The number of images before and after the visible images in the image list
+# for which thumbnails are loaded.
+THUMBNAIL_LOADING_BUFFER_SIZE = 20
 
 
-def get_file_paths(directory_path: Path) -> set[Path]:
+@cache
+def get_image_suffixes() -> frozenset[str]:
     """
-    Recursively get all file paths in a directory, including those in
-    subdirectories.
+    Get the lowercase file extensions of the image formats that Qt and its
+    installed image format plugins can read.
     """
-    file_paths = set()
-    for path in directory_path.iterdir():
-        if path.is_file():
-            file_paths.add(path)
-        elif path.is_dir():
-            file_paths.update(get_file_paths(path))
-    return file_paths
+    image_formats = QImageReader.supportedImageFormats()
+    # JFIF files are JPEG files, but the extension is not listed.
+    return frozenset({'.jfif'}
+                     | {f'.{bytes(image_format).decode().lower()}'
+                        for image_format in image_formats})
+
+
+def get_image_paths_and_text_file_stems(
+        directory_path: Path) -> tuple[list[Path], set[str]]:
+    """
+    Recursively get the paths of all image files in a directory, including
+    those in subdirectories, and the paths of all text files without the
+    `.txt` extension. The directory tree is traversed only once, and the file
+    types are determined from the names of the directory entries to avoid
+    extra system calls. Hidden files and files in formats that cannot be read
+    are ignored.
+    """
+    image_suffixes = get_image_suffixes()
+    image_paths = []
+    text_file_stems = set()
+    directory_path_strings = [str(directory_path)]
+    while directory_path_strings:
+        with os.scandir(directory_path_strings.pop()) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.name.endswith('.txt'):
+                        text_file_stems.add(entry.path[:-4])
+                    elif (os.path.splitext(entry.name)[1].lower()
+                          in image_suffixes):
+                        image_paths.append(Path(entry.path))
+                elif entry.is_dir():
+                    directory_path_strings.append(entry.path)
+    return image_paths, text_file_stems
+
+
+def get_image_dimensions(image_path: Path) -> tuple[int, int] | None:
+    # Only the image header is read.
+    image_reader = QImageReader(str(image_path))
+    size = image_reader.size()
+    if not size.isValid():
+        print(f'Failed to get dimensions for {image_path}: '
+              f'{image_reader.errorString()}')
+        return None
+    dimensions = (size.width(), size.height())
+    # Check the orientation tag and rotate the dimensions if necessary.
+    if (image_reader.transformation()
+            & QImageIOHandler.Transformation.TransformationRotate90):
+        dimensions = (dimensions[1], dimensions[0])
+    return dimensions
+
+
+def read_text_file_bytes(text_file_path: Path,
+                         directory_fd: int | None) -> bytes:
+    """
+    Read a text file. If a file descriptor of the directory containing the
+    file is given, the file is opened relative to it so that the rest of the
+    path does not have to be resolved again.
+    """
+    if directory_fd is None:
+        return text_file_path.read_bytes()
+    text_file_fd = os.open(text_file_path.name, os.O_RDONLY,
+                           dir_fd=directory_fd)
+    try:
+        chunks = []
+        while chunk := os.read(text_file_fd, TEXT_FILE_READ_SIZE):
+            chunks.append(chunk)
+    finally:
+        os.close(text_file_fd)
+    return b''.join(chunks)
+
+
+def get_tags(text_file_path: Path, separator: str,
+             directory_fd: int | None = None) -> list[str]:
+    # Reading the bytes and decoding them directly is faster than going
+    # through a text stream. `errors='replace'` inserts a replacement marker
+    # such as '?' when there is malformed data.
+    caption = read_text_file_bytes(text_file_path, directory_fd).decode(
+        'utf-8', errors='replace')
+    if not caption:
+        return []
+    # Translate the newlines like a text stream would.
+    if '\r' in caption:
+        caption = caption.replace('\r\n', '\n').replace('\r', '\n')
+    tags = caption.split(separator)
+    tags = [tag.strip() for tag in tags]
+    tags = [tag for tag in tags if tag]
+    return tags
+
+
+def write_text_file(text_file_path: Path, text: str):
+    # Write to a temporary file first and then rename it, so that the
+    # existing text is not lost if writing fails partway through.
+    temporary_file_path = text_file_path.with_suffix('.txt.tmp')
+    try:
+        with open(temporary_file_path, 'w', encoding='utf-8',
+                  errors='replace') as temporary_file:
+            temporary_file.write(text)
+            temporary_file.flush()
+            os.fsync(temporary_file.fileno())
+        os.replace(temporary_file_path, text_file_path)
+    except OSError:
+        with suppress(OSError):
+            temporary_file_path.unlink(missing_ok=True)
+        raise
+
+
+def load_image(image_path: Path, text_file_path: Path | None,
+               separator: str, directory_fd: int | None = None) -> Image:
+    """
+    Load the metadata and the tags of an image. This is run in a worker
+    thread.
+    """
+    try:
+        modified_time = image_path.stat().st_mtime
+    except OSError:
+        modified_time = None
+    dimensions = get_image_dimensions(image_path)
+    tags = (get_tags(text_file_path, separator, directory_fd)
+            if text_file_path else [])
+    return Image(image_path, dimensions, tags, modified_time)
+
+
+class DirectoryLoadThread(QThread):
+    """
+    Load the images in a directory in the background. The images are emitted
+    in batches, in order, so that they can be shown while the rest of the
+    directory is loaded.
+    """
+    images_loaded = Signal(list)
+
+    def __init__(self, parent, directory_path: Path, separator: str):
+        super().__init__(parent)
+        self.directory_path = directory_path
+        self.separator = separator
+
+    def run(self):
+        image_paths, text_file_stems = get_image_paths_and_text_file_stems(
+            self.directory_path)
+        # Sort the paths before loading the images. `executor.map()` returns
+        # the results in the same order, so the images do not have to be
+        # sorted afterwards.
+        image_paths.sort()
+        text_file_paths = []
+        for image_path in image_paths:
+            image_path_stem = os.path.splitext(image_path)[0]
+            text_file_paths.append(Path(f'{image_path_stem}.txt')
+                                   if image_path_stem in text_file_stems
+                                   else None)
+        directory_fds = {}
+        try:
+            text_file_directory_fds = self.get_text_file_directory_fds(
+                text_file_paths, directory_fds)
+            self.load_images(image_paths, text_file_paths,
+                             text_file_directory_fds)
+        finally:
+            for directory_fd in directory_fds.values():
+                if directory_fd is not None:
+                    os.close(directory_fd)
+
+    def get_text_file_directory_fds(
+            self, text_file_paths: list[Path | None],
+            directory_fds: dict[Path, int | None]) -> list[int | None]:
+        """
+        Open each directory containing text files once, add the file
+        descriptors to `directory_fds`, and return the file descriptor of the
+        directory of each text file, or `None` if it could not be opened. The
+        text files are then opened relative to their directories, which is
+        not supported on all platforms.
+        """
+        if os.open not in os.supports_dir_fd:
+            return [None] * len(text_file_paths)
+        text_file_directory_fds = []
+        for text_file_path in text_file_paths:
+            if text_file_path is None:
+                text_file_directory_fds.append(None)
+                continue
+            directory_path = text_file_path.parent
+            if directory_path not in directory_fds:
+                try:
+                    directory_fds[directory_path] = os.open(
+                        directory_path,
+                        os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+                except OSError:
+                    directory_fds[directory_path] = None
+            text_file_directory_fds.append(directory_fds[directory_path])
+        return text_file_directory_fds
+
+    def load_images(self, image_paths: list[Path],
+                    text_file_paths: list[Path | None],
+                    text_file_directory_fds: list[int | None]):
+        # Reading the image headers and the text files is I/O-bound, so use
+        # multiple threads to do it in parallel.
+        with ThreadPoolExecutor(
+                max_workers=IMAGE_LOADING_THREAD_COUNT) as executor:
+            images = executor.map(
+                lambda image_path, text_file_path, directory_fd: load_image(
+                    image_path, text_file_path, self.separator, directory_fd),
+                image_paths, text_file_paths, text_file_directory_fds)
+            image_batch = []
+            batch_start_time = time.monotonic()
+            for image in images:
+                if self.isInterruptionRequested():
+                    executor.shutdown(cancel_futures=True)
+                    return
+                image_batch.append(image)
+                if time.monotonic() - batch_start_time >= IMAGE_BATCH_INTERVAL:
+                    self.images_loaded.emit(image_batch)
+                    image_batch = []
+                    batch_start_time = time.monotonic()
+            if image_batch:
+                self.images_loaded.emit(image_batch)
 
 
 @dataclass
@@ -39,98 +261,229 @@ class HistoryItem:
 
 class ImageListModel(QAbstractListModel):
     update_undo_and_redo_actions_requested = Signal()
+    # Emitted when all the images in the directory have been loaded.
+    directory_loaded = Signal()
+    # Emitted from the tag writing thread with the path of the image.
+    tag_writing_failed = Signal(object)
 
     def __init__(self, image_list_image_width: int, separator: str):
         super().__init__()
         self.image_list_image_width = image_list_image_width
         self.separator = separator
         self.images: list[Image] = []
+        # The thumbnail cache key of each image, computed once when the
+        # images are loaded so that painting a row only needs a list lookup.
+        self.thumbnail_keys: list[tuple] = []
+        # Thumbnails are kept across directory reloads and are regenerated
+        # when the image file is modified.
+        self.thumbnail_cache = ThumbnailCache()
+        # Thumbnails are loaded in worker threads to keep the GUI responsive.
+        # A transparent placeholder is shown until a thumbnail is loaded.
+        self.thumbnail_thread_pool = QThreadPool.globalInstance()
+        self.thumbnail_loader_signals = ThumbnailLoaderSignals()
+        self.thumbnail_loader_signals.thumbnail_loaded.connect(
+            self.add_thumbnail)
+        self.pending_thumbnail_loaders: dict[tuple, ThumbnailLoader] = {}
+        # The indices of the images for which thumbnails are loaded, or
+        # `None` if the visible images are not known.
+        self.thumbnail_loading_range: range | None = None
+        placeholder_pixmap = QPixmap(image_list_image_width,
+                                     image_list_image_width)
+        placeholder_pixmap.fill(Qt.transparent)
+        self.placeholder_thumbnail = QIcon(placeholder_pixmap)
+        # Tags are written to disk in a background thread so that saving
+        # does not block the GUI. A single thread is used so that the writes
+        # for each image happen in order.
+        self.tag_writing_executor = ThreadPoolExecutor(max_workers=1)
+        self.tag_writing_failed.connect(self.show_tag_writing_error)
+        # The rows changed by `update_image_tags()` since the last
+        # `dataChanged` signal. The signal is emitted once for all of them on
+        # the next iteration of the event loop.
+        self.changed_image_rows: set[int] = set()
+        self.data_change_timer = QTimer(self)
+        self.data_change_timer.setSingleShot(True)
+        self.data_change_timer.setInterval(0)
+        self.data_change_timer.timeout.connect(self.emit_image_data_change)
+        self.role_data_getters = {
+            Qt.UserRole: self.get_image,
+            Qt.DisplayRole: self.get_image_text,
+            Qt.DecorationRole: self.get_image_thumbnail,
+            Qt.SizeHintRole: self.get_image_size_hint
+        }
         self.undo_stack = deque(maxlen=UNDO_STACK_SIZE)
         self.redo_stack = []
         self.proxy_image_list_model = None
+        self.directory_load_thread: DirectoryLoadThread | None = None
 
     def rowCount(self, parent=None) -> int:
         return len(self.images)
 
     def data(self, index, role=None) -> Image | str | QIcon | QSize:
-        image = self.images[index.row()]
-        if role == Qt.UserRole:
-            return image
-        if role == Qt.DisplayRole:
-            # The text shown next to the thumbnail in the image list.
-            text = image.path.name
-            if image.tags:
-                caption = self.separator.join(image.tags)
-                text += f'\n{caption}'
-            return text
-        if role == Qt.DecorationRole:
-            # The thumbnail. If the image already has a thumbnail stored, use
-            # it. Otherwise, generate a thumbnail and save it to the image.
-            if image.thumbnail:
-                return image.thumbnail
-            image_reader = QImageReader(str(image.path))
-            # Rotate the image based on the orientation tag.
-            image_reader.setAutoTransform(True)
-            pixmap = QPixmap.fromImageReader(image_reader).scaledToWidth(
-                self.image_list_image_width, Qt.SmoothTransformation)
-            thumbnail = QIcon(pixmap)
-            image.thumbnail = thumbnail
+        # Look up the role in a dictionary instead of comparing it with each
+        # supported role, because this is called very often while painting.
+        role_data_getter = self.role_data_getters.get(role)
+        if role_data_getter is None:
+            return None
+        return role_data_getter(index.row())
+
+    def get_image(self, image_index: int) -> Image:
+        return self.images[image_index]
+
+    def get_image_text(self, image_index: int) -> str:
+        """Get the text shown next to the thumbnail in the image list."""
+        image = self.images[image_index]
+        text = image.path.name
+        if image.tags:
+            caption = self.separator.join(image.tags)
+            text += f'\n{caption}'
+        return text
+
+    def get_image_thumbnail(self, image_index: int) -> QIcon:
+        """
+        Get the thumbnail of an image if it is cached. Otherwise, return a
+        placeholder and load the thumbnail in the background.
+        """
+        thumbnail_key = self.thumbnail_keys[image_index]
+        thumbnail = self.thumbnail_cache.get(thumbnail_key)
+        if thumbnail is not None:
             return thumbnail
-        if role == Qt.SizeHintRole:
-            if image.thumbnail:
-                return image.thumbnail.availableSizes()[0]
-            dimensions = image.dimensions
-            if not dimensions:
-                return QSize(self.image_list_image_width,
-                             self.image_list_image_width)
-            width, height = dimensions
-            # Scale the dimensions to the image width.
+        if (thumbnail_key not in self.pending_thumbnail_loaders
+                and (self.thumbnail_loading_range is None
+                     or image_index in self.thumbnail_loading_range)):
+            image = self.images[image_index]
+            thumbnail_loader = ThumbnailLoader(
+                self.thumbnail_loader_signals, thumbnail_key, image_index,
+                image.path, image.dimensions, image.modified_time,
+                self.image_list_image_width)
+            self.pending_thumbnail_loaders[thumbnail_key] = thumbnail_loader
+            self.thumbnail_thread_pool.start(thumbnail_loader)
+        return self.placeholder_thumbnail
+
+    def get_image_size_hint(self, image_index: int) -> QSize:
+        thumbnail = self.thumbnail_cache.get(self.thumbnail_keys[image_index])
+        if thumbnail:
+            return thumbnail.availableSizes()[0]
+        dimensions = self.images[image_index].dimensions
+        if not dimensions:
             return QSize(self.image_list_image_width,
-                         int(self.image_list_image_width * height / width))
+                         self.image_list_image_width)
+        width, height = dimensions
+        # Scale the dimensions to the image width.
+        return QSize(self.image_list_image_width,
+                     int(self.image_list_image_width * height / width))
+
+    def get_thumbnail_key(self, image: Image) -> tuple[Path, float | None,
+                                                       int]:
+        return image.path, image.modified_time, self.image_list_image_width
+
+    @Slot(object, int, QImage)
+    def add_thumbnail(self, thumbnail_key: tuple, image_index: int,
+                      thumbnail_image: QImage):
+        """Add a thumbnail loaded in a worker thread to the cache."""
+        self.pending_thumbnail_loaders.pop(thumbnail_key, None)
+        pixmap = QPixmap.fromImage(thumbnail_image)
+        # Cache the thumbnail even if the image could not be loaded, so that
+        # loading it is not retried every time the image list is repainted.
+        self.thumbnail_cache.put(
+            thumbnail_key, QIcon(pixmap),
+            pixmap.width() * pixmap.height() * pixmap.depth() // 8)
+        # The images may have changed while the thumbnail was being loaded.
+        if (image_index < len(self.thumbnail_keys)
+                and self.thumbnail_keys[image_index] == thumbnail_key):
+            index = self.index(image_index)
+            self.dataChanged.emit(index, index,
+                                  [Qt.DecorationRole, Qt.SizeHintRole])
+
+    def set_visible_image_range(self, first_image_index: int,
+                                last_image_index: int):
+        """
+        Set the range of images that are visible in the image list. Only
+        thumbnails of images in or near this range are loaded, and pending
+        thumbnails of images outside of it are canceled.
+        """
+        self.thumbnail_loading_range = range(
+            max(first_image_index - THUMBNAIL_LOADING_BUFFER_SIZE, 0),
+            last_image_index + THUMBNAIL_LOADING_BUFFER_SIZE + 1)
+        for thumbnail_key, thumbnail_loader in list(
+                self.pending_thumbnail_loaders.items()):
+            if (thumbnail_loader.image_index
+                    not in self.thumbnail_loading_range):
+                self.cancel_thumbnail_loader(thumbnail_key)
+
+    def cancel_thumbnail_loader(self, thumbnail_key: tuple):
+        thumbnail_loader = self.pending_thumbnail_loaders.pop(thumbnail_key)
+        # Remove the loader from the thread pool queue if it has not started
+        # yet, and only flag it as canceled if it has. A canceled loader that
+        # has already started still emits its thumbnail, which is then cached
+        # as usual.
+        try:
+            is_taken = self.thumbnail_thread_pool.tryTake(thumbnail_loader)
+        except RuntimeError:
+            # The thread pool deletes loaders that have finished running, but
+            # they stay pending until their thumbnail is added.
+            return
+        if not is_taken:
+            thumbnail_loader.is_canceled = True
 
     def load_directory(self, directory_path: Path):
-        self.images.clear()
+        """
+        Start loading the images in a directory. The images are added to the
+        model as they are loaded, and `directory_loaded` is emitted when all
+        of them have been loaded.
+        """
+        self.stop_loading_directory()
+        # Make sure that the text files contain the latest tags before they
+        # are read.
+        self.wait_for_tag_writes()
         self.undo_stack.clear()
         self.redo_stack.clear()
         self.update_undo_and_redo_actions_requested.emit()
-        file_paths = get_file_paths(directory_path)
-        text_file_paths = {path for path in file_paths
-                           if path.suffix == '.txt'}
-        image_paths = file_paths - text_file_paths
-        image_paths = {path for path in image_paths
-                       if path.suffix.lower() not in ('.json', '.jsonl')}
-        for image_path in image_paths:
-            try:
-                dimensions = imagesize.get(image_path)
-                # Check the orientation tag and rotate the dimensions if
-                # necessary.
-                with open(image_path, 'rb') as image_file:
-                    exif_tags = exifread.process_file(
-                        image_file, details=False,
-                        stop_tag='Image Orientation')
-                    if 'Image Orientation' in exif_tags:
-                        if any(value in exif_tags['Image Orientation'].values
-                               for value in (5, 6, 7, 8)):
-                            dimensions = (dimensions[1], dimensions[0])
-            except (ValueError, OSError) as exception:
-                print(f'Failed to get dimensions for {image_path}: '
-                      f'{exception}')
-                dimensions = None
-            tags = []
-            text_file_path = image_path.with_suffix('.txt')
-            if text_file_path in text_file_paths:
-                # `errors='replace'` inserts a replacement marker such as '?'
-                # when there is malformed data.
-                caption = text_file_path.read_text(encoding='utf-8',
-                                                   errors='replace')
-                if caption:
-                    tags = caption.split(self.separator)
-                    tags = [tag.strip() for tag in tags]
-                    tags = [tag for tag in tags if tag]
-            image = Image(image_path, dimensions, tags)
-            self.images.append(image)
-        self.images.sort(key=lambda image_: image_.path)
-        self.modelReset.emit()
+        self.beginResetModel()
+        # The changed rows and the indices of the pending thumbnails refer to
+        # the old images.
+        for thumbnail_key in list(self.pending_thumbnail_loaders):
+            self.cancel_thumbnail_loader(thumbnail_key)
+        self.thumbnail_loading_range = None
+        self.changed_image_rows.clear()
+        self.images = []
+        self.thumbnail_keys = []
+        self.endResetModel()
+        self.directory_load_thread = DirectoryLoadThread(self, directory_path,
+                                                         self.separator)
+        self.directory_load_thread.images_loaded.connect(self.add_images)
+        self.directory_load_thread.finished.connect(
+            self.handle_directory_load_finish)
+        self.directory_load_thread.start()
+
+    def stop_loading_directory(self):
+        """Stop loading the current directory and wait for the thread."""
+        if self.directory_load_thread is None:
+            return
+        self.directory_load_thread.requestInterruption()
+        self.directory_load_thread.wait()
+        self.directory_load_thread.deleteLater()
+        self.directory_load_thread = None
+
+    @Slot(list)
+    def add_images(self, images: list[Image]):
+        # Ignore batches from a directory that is no longer being loaded.
+        if self.sender() is not self.directory_load_thread:
+            return
+        first_image_index = len(self.images)
+        self.beginInsertRows(QModelIndex(), first_image_index,
+                             first_image_index + len(images) - 1)
+        self.images.extend(images)
+        self.thumbnail_keys.extend(self.get_thumbnail_key(image)
+                                   for image in images)
+        self.endInsertRows()
+
+    @Slot()
+    def handle_directory_load_finish(self):
+        if self.sender() is not self.directory_load_thread:
+            return
+        self.directory_load_thread.deleteLater()
+        self.directory_load_thread = None
+        self.directory_loaded.emit()
 
     def add_to_undo_stack(self, action_name: str,
                           should_ask_for_confirmation: bool):
@@ -142,16 +495,32 @@ class ImageListModel(QAbstractListModel):
         self.update_undo_and_redo_actions_requested.emit()
 
     def write_image_tags_to_disk(self, image: Image):
+        # Join the tags now because they can change before they are written.
+        self.tag_writing_executor.submit(
+            self.write_image_tags_file, image.path, image.caption_path,
+            self.separator.join(image.tags))
+
+    def write_image_tags_file(self, image_path: Path, caption_path: Path,
+                              caption: str):
+        """Write the tags of an image. This is run in a worker thread."""
         try:
-            image.path.with_suffix('.txt').write_text(
-                self.separator.join(image.tags), encoding='utf-8',
-                errors='replace')
+            write_text_file(caption_path, caption)
         except OSError:
-            error_message_box = QMessageBox()
-            error_message_box.setWindowTitle('Error')
-            error_message_box.setIcon(QMessageBox.Icon.Critical)
-            error_message_box.setText(f'Failed to save tags for {image.path}.')
-            error_message_box.exec()
+            self.tag_writing_failed.emit(image_path)
+
+    def wait_for_tag_writes(self):
+        """Wait until all pending tags have been written to disk."""
+        # The executor runs the tasks in order, so all the writes are done
+        # once this empty task has run.
+        self.tag_writing_executor.submit(lambda: None).result()
+
+    @Slot(object)
+    def show_tag_writing_error(self, image_path: Path):
+        error_message_box = QMessageBox()
+        error_message_box.setWindowTitle('Error')
+        error_message_box.setIcon(QMessageBox.Icon.Critical)
+        error_message_box.setText(f'Failed to save tags for {image_path}.')
+        error_message_box.exec()
 
     def restore_history_tags(self, is_undo: bool):
         if is_undo:
@@ -363,9 +732,20 @@ class ImageListModel(QAbstractListModel):
         if image.tags == tags:
             return
         image.tags = tags
-        self.dataChanged.emit(image_index, image_index)
+        self.changed_image_rows.add(image_index.row())
+        self.data_change_timer.start()
         self.write_image_tags_to_disk(image)
 
+    @Slot()
+    def emit_image_data_change(self):
+        """Emit a single `dataChanged` signal for all the changed rows."""
+        if not self.changed_image_rows:
+            return
+        first_changed_index = self.index(min(self.changed_image_rows))
+        last_changed_index = self.index(max(self.changed_image_rows))
+        self.changed_image_rows.clear()
+        self.dataChanged.emit(first_changed_index, last_changed_index)
+
     @Slot(list, list)
     def add_tags(self, tags: list[str], image_indices: list[QModelIndex]):
         """Add one or more tags to one or more images."""
@@ -1,6 +1,6 @@
 import operator
 
-from PySide6.QtCore import QModelIndex, QSortFilterProxyModel, Qt
+from PySide6.QtCore import QModelIndex, QSortFilterProxyModel, Qt, Slot
 from transformers import PreTrainedTokenizerBase
 
 from models.image_list_model import ImageListModel
@@ -15,6 +15,42 @@ class ProxyImageListModel(QSortFilterProxyModel):
         self.tokenizer = tokenizer
         self.separator = separator
         self.filter: list | None = None
+        # The number of tokens in each caption of the loaded images that has
+        # been tokenized, so that the captions do not have to be tokenized
+        # again every time the filter changes.
+        self.caption_token_counts: dict[str, int] = {}
+        # The number of images, from the start of the image list, whose
+        # captions have been tokenized. Images are only added to the end of
+        # the list while a directory is being loaded.
+        self.tokenized_image_count = 0
+        image_list_model.modelReset.connect(self.clear_caption_token_counts)
+
+    @Slot()
+    def clear_caption_token_counts(self):
+        self.caption_token_counts.clear()
+        self.tokenized_image_count = 0
+
+    def get_caption_token_count(self, caption: str) -> int:
+        """
+        Get the number of tokens in a caption. When a caption has not been
+        tokenized yet, it is tokenized in a single batch with the captions of
+        the images that were added since the last batch, which is much faster
+        than tokenizing them one by one.
+        """
+        if caption in self.caption_token_counts:
+            return self.caption_token_counts[caption]
+        images = self.sourceModel().images
+        captions = {caption}
+        captions.update(self.separator.join(image.tags)
+                        for image in images[self.tokenized_image_count:])
+        self.tokenized_image_count = len(images)
+        captions = [caption_ for caption_ in captions
+                    if caption_ not in self.caption_token_counts]
+        for caption_, token_ids in zip(captions,
+                                       self.tokenizer(captions).input_ids):
+            # Subtract 2 for the `<|startoftext|>` and `<|endoftext|>` tokens.
+            self.caption_token_counts[caption_] = len(token_ids) - 2
+        return self.caption_token_counts[caption]
 
     def does_image_match_filter(self, image: Image,
                                 filter_: list | str) -> bool:
@@ -58,8 +94,7 @@ class ProxyImageListModel(QSortFilterProxyModel):
             number_to_compare = len(caption)
         elif filter_[0] == 'tokens':
             caption = self.separator.join(image.tags)
-            # Subtract 2 for the `<|startoftext|>` and `<|endoftext|>` tokens.
-            number_to_compare = len(self.tokenizer(caption).input_ids) - 2
+            number_to_compare = self.get_caption_token_count(caption)
         return comparison_operator(number_to_compare, int(filter_[2]))
 
     def filterAcceptsRow(self, source_row: int,
@@ -74,3 +109,13 @@ class ProxyImageListModel(QSortFilterProxyModel):
     def is_image_in_filtered_images(self, image: Image) -> bool:
         return (self.filter is None
                 or self.does_image_match_filter(image, self.filter))
+
+    def get_images_for_proxy_rows(self, rows: list[int]) -> list[Image]:
+        """
+        Get the images in the given proxy rows by mapping the rows to source
+        rows and reading the images from the source model directly, instead
+        of going through `data()` for each image.
+        """
+        images = self.sourceModel().images
+        return [images[self.mapToSource(self.index(row, 0)).row()]
+                for row in rows]
@@ -1,3 +1,4 @@
+import os
 import sys
 import traceback
 
@@ -9,6 +10,12 @@ from widgets.main_window import MainWindow
 
 
 def run_gui():
+    # Let the PyTorch CUDA memory allocator grow its memory segments instead
+    # of allocating new ones, which reduces fragmentation when switching
+    # between models of different sizes. This is not supported on Windows.
+    if sys.platform != 'win32':
+        os.environ.setdefault('PYTORCH_CUDA_ALLOC_CONF',
+                              'expandable_segments:True')
     app = QApplication([])
     # The application name is shown in the taskbar.
     app.setApplicationName('TagGUI')
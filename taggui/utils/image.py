@@ -1,12 +1,17 @@
 from dataclasses import dataclass, field
+from functools import cached_property
 from pathlib import Path
 
-from PySide6.QtGui import QIcon
-
 
 @dataclass
 class Image:
     path: Path
     dimensions: tuple[int, int] | None
     tags: list[str] = field(default_factory=list)
-    thumbnail: QIcon | None = None
+    # The modification time of the image file when it was loaded.
+    modified_time: float | None = None
+
+    @cached_property
+    def caption_path(self) -> Path:
+        """The path of the text file that contains the tags of the image."""
+        return self.path.with_suffix('.txt')
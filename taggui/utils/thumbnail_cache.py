@@ -0,0 +1,59 @@
+from collections import OrderedDict
+from collections.abc import Hashable
+
+from PySide6.QtGui import QIcon
+
+# The maximum total size of the thumbnails kept in memory.
+DEFAULT_THUMBNAIL_CACHE_BYTES = 128 * 1024 * 1024
+
+
+class ThumbnailCache:
+    """
+    Least recently used cache of thumbnail icons with a limit on the total
+    number of bytes used by the thumbnails.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_THUMBNAIL_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.byte_count = 0
+        self.thumbnails: OrderedDict[Hashable, tuple[QIcon, int]] = (
+            OrderedDict())
+
+    def __len__(self) -> int:
+        return len(self.thumbnails)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.thumbnails
+
+    def get(self, key: Hashable) -> QIcon | None:
+        """Get a thumbnail and mark it as the most recently used."""
+        cached_thumbnail = self.thumbnails.get(key)
+        if cached_thumbnail is None:
+            return None
+        self.thumbnails.move_to_end(key)
+        return cached_thumbnail[0]
+
+    def put(self, key: Hashable, thumbnail: QIcon, byte_count: int):
+        """
+        Add a thumbnail and evict the least recently used thumbnails until the
+        cache is within its size limit.
+        """
+        self.pop(key)
+        self.thumbnails[key] = (thumbnail, byte_count)
+        self.byte_count += byte_count
+        # Always keep the newest thumbnail, even if it is larger than the
+        # limit by itself.
+        while self.byte_count > self.max_bytes and len(self.thumbnails) > 1:
+            _, (_, evicted_byte_count) = self.thumbnails.popitem(last=False)
+            self.byte_count -= evicted_byte_count
+
+    def pop(self, key: Hashable) -> QIcon | None:
+        cached_thumbnail = self.thumbnails.pop(key, None)
+        if cached_thumbnail is None:
+            return None
+        self.byte_count -= cached_thumbnail[1]
+        return cached_thumbnail[0]
+
+    def clear(self):
+        self.thumbnails.clear()
+        self.byte_count = 0
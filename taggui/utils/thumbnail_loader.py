@@ -0,0 +1,227 @@
+import hashlib
+import os
+import struct
+import sys
+import threading
+from collections.abc import Hashable
+from contextlib import suppress
+from functools import cache
+from pathlib import Path
+
+from PySide6.QtCore import (QObject, QRunnable, QSize, QStandardPaths, QUrl,
+                            Qt, Signal)
+from PySide6.QtGui import QImage, QImageIOHandler, QImageReader, QImageWriter
+
+# The thumbnail sizes and directory names defined by the freedesktop.org
+# thumbnail specification.
+THUMBNAIL_SIZES = ((128, 'normal'), (256, 'large'), (512, 'x-large'),
+                   (1024, 'xx-large'))
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# The largest factor by which images are scaled down while they are being
+# decoded. JPEG images can be decoded at 1/2, 1/4, or 1/8 of their size.
+MAX_DECODING_SCALE_FACTOR = 8
+
+
+@cache
+def get_thumbnails_directory_path() -> Path:
+    """
+    Get the shared thumbnail cache directory on platforms that follow the
+    freedesktop.org specification, or a cache directory of this application
+    on other platforms.
+    """
+    if sys.platform.startswith(('linux', 'freebsd', 'openbsd', 'netbsd')):
+        # This is `$XDG_CACHE_HOME` (`~/.cache` by default).
+        cache_location = QStandardPaths.StandardLocation.GenericCacheLocation
+    else:
+        cache_location = QStandardPaths.StandardLocation.CacheLocation
+    cache_directory_path = QStandardPaths.writableLocation(cache_location)
+    return Path(cache_directory_path) / 'thumbnails'
+
+
+def get_thumbnail_size(dimensions: tuple[int, int] | None,
+                       width: int) -> tuple[int, str] | None:
+    """
+    Get the smallest thumbnail size in the thumbnail specification that is
+    large enough to be scaled down to the given width, or `None` if there is
+    no such size.
+    """
+    if not dimensions or min(dimensions) <= 0:
+        return None
+    image_width, image_height = dimensions
+    for size, size_name in THUMBNAIL_SIZES:
+        # Thumbnails are scaled to fit in a square of the thumbnail size, but
+        # images that are smaller than the square are not scaled up.
+        thumbnail_width = image_width * min(size / max(dimensions), 1)
+        if thumbnail_width >= min(width, image_width):
+            return size, size_name
+    return None
+
+
+def get_png_text(png_data: bytes) -> dict[str, str]:
+    """
+    Get the `tEXt` chunks that come before the image data in a PNG file. Qt
+    cannot be used for this because it does not support keys that contain
+    colons, such as `Thumb::MTime`.
+    """
+    if not png_data.startswith(PNG_SIGNATURE):
+        return {}
+    text = {}
+    position = len(PNG_SIGNATURE)
+    while position + 8 <= len(png_data):
+        chunk_length, chunk_type = struct.unpack_from('>I4s', png_data,
+                                                      position)
+        if chunk_type == b'IDAT':
+            break
+        if chunk_type == b'tEXt':
+            chunk_data = png_data[position + 8:position + 8 + chunk_length]
+            key, _, value = chunk_data.partition(b'\0')
+            text[key.decode('latin-1')] = value.decode('latin-1')
+        # The chunk length does not include the length, type, and CRC fields.
+        position += chunk_length + 12
+    return text
+
+
+class ThumbnailLoaderSignals(QObject):
+    # The thumbnail key, the image index, and the thumbnail image.
+    thumbnail_loaded = Signal(object, int, QImage)
+
+
+class ThumbnailLoader(QRunnable):
+    """
+    Load a thumbnail in a worker thread. `QImage` is used instead of `QPixmap`
+    because `QPixmap` can only be used in the GUI thread.
+
+    Thumbnails are also saved to and loaded from the shared thumbnail cache
+    directory defined by the freedesktop.org thumbnail specification (or the
+    application's own cache directory on Windows and macOS), so that they do
+    not have to be generated again when the application is restarted.
+    """
+
+    def __init__(self, signals: ThumbnailLoaderSignals, key: Hashable,
+                 image_index: int, image_path: Path,
+                 image_dimensions: tuple[int, int] | None,
+                 image_modified_time: float | None, width: int):
+        super().__init__()
+        self.signals = signals
+        self.key = key
+        self.image_index = image_index
+        self.image_path = image_path
+        self.image_dimensions = image_dimensions
+        self.image_modified_time = image_modified_time
+        self.width = width
+        # Set from the GUI thread when the thumbnail is no longer needed.
+        self.is_canceled = False
+
+    def run(self):
+        if self.is_canceled:
+            return
+        thumbnail_file_path = self.get_thumbnail_file_path()
+        image = QImage()
+        if thumbnail_file_path:
+            image = self.read_thumbnail_file(thumbnail_file_path)
+        if image.isNull():
+            image_reader = QImageReader(str(self.image_path))
+            # Rotate the image based on the orientation tag.
+            image_reader.setAutoTransform(True)
+            size = None
+            if thumbnail_file_path:
+                size, _ = get_thumbnail_size(self.image_dimensions,
+                                             self.width)
+            self.set_scaled_size(image_reader, size)
+            image = image_reader.read()
+            if thumbnail_file_path and not image.isNull():
+                if image.width() > size or image.height() > size:
+                    image = image.scaled(size, size, Qt.KeepAspectRatio,
+                                         Qt.SmoothTransformation)
+                self.write_thumbnail_file(image, thumbnail_file_path)
+        if not image.isNull():
+            image = image.scaledToWidth(self.width, Qt.SmoothTransformation)
+        self.signals.thumbnail_loaded.emit(self.key, self.image_index, image)
+
+    def set_scaled_size(self, image_reader: QImageReader,
+                        thumbnail_size: int | None):
+        """
+        Make the image reader scale the image down by a power of two while
+        decoding it, so that large images do not have to be decoded at full
+        resolution. The image is kept large enough to fill the thumbnail
+        size, or the thumbnail width if there is no thumbnail size.
+        """
+        image_size = image_reader.size()
+        if not image_size.isValid() or min(image_size.width(),
+                                           image_size.height()) <= 0:
+            return
+        image_width = image_size.width()
+        image_height = image_size.height()
+        if thumbnail_size:
+            scale = max(image_width, image_height) / thumbnail_size
+        else:
+            # The scaled size is applied before the image is rotated.
+            is_rotated = bool(
+                image_reader.transformation()
+                & QImageIOHandler.Transformation.TransformationRotate90)
+            displayed_width = image_height if is_rotated else image_width
+            scale = displayed_width / self.width
+        scale_factor = 1
+        while scale_factor * 2 <= min(scale, MAX_DECODING_SCALE_FACTOR):
+            scale_factor *= 2
+        if scale_factor > 1:
+            image_reader.setScaledSize(QSize(image_width // scale_factor,
+                                             image_height // scale_factor))
+
+    def get_image_uri(self) -> str:
+        return QUrl.fromLocalFile(str(self.image_path)).toString(
+            QUrl.ComponentFormattingOption.FullyEncoded)
+
+    def get_thumbnail_file_path(self) -> Path | None:
+        if self.image_modified_time is None:
+            return None
+        thumbnail_size = get_thumbnail_size(self.image_dimensions, self.width)
+        if not thumbnail_size:
+            return None
+        thumbnails_directory_path = get_thumbnails_directory_path()
+        # Do not create thumbnails of thumbnails.
+        if thumbnails_directory_path in self.image_path.parents:
+            return None
+        _, size_name = thumbnail_size
+        uri_hash = hashlib.md5(self.get_image_uri().encode()).hexdigest()
+        return thumbnails_directory_path / size_name / f'{uri_hash}.png'
+
+    def read_thumbnail_file(self, thumbnail_file_path: Path) -> QImage:
+        """
+        Read a thumbnail file, or return a null image if it does not exist or
+        is outdated.
+        """
+        try:
+            thumbnail_data = thumbnail_file_path.read_bytes()
+        except OSError:
+            return QImage()
+        thumbnail_modified_time = get_png_text(thumbnail_data).get(
+            'Thumb::MTime')
+        if thumbnail_modified_time != str(int(self.image_modified_time)):
+            return QImage()
+        return QImage.fromData(thumbnail_data)
+
+    def write_thumbnail_file(self, image: QImage, thumbnail_file_path: Path):
+        # Write to a temporary file first and then rename it, so that other
+        # programs never read a partially written thumbnail.
+        temporary_file_path = thumbnail_file_path.with_name(
+            f'{thumbnail_file_path.stem}-{os.getpid()}-'
+            f'{threading.get_ident()}.png')
+        try:
+            thumbnail_file_path.parent.mkdir(mode=0o700, parents=True,
+                                             exist_ok=True)
+            # `QImageWriter.setText()` cannot be used because it does not
+            # support keys that contain colons.
+            image.setText('Thumb::URI', self.get_image_uri())
+            image.setText('Thumb::MTime', str(int(self.image_modified_time)))
+            image.setText('Software', 'TagGUI')
+            thumbnail_writer = QImageWriter(str(temporary_file_path), b'png')
+            if not thumbnail_writer.write(image):
+                temporary_file_path.unlink(missing_ok=True)
+                return
+            os.chmod(temporary_file_path, 0o600)
+            os.replace(temporary_file_path, thumbnail_file_path)
+        except OSError:
+            # The thumbnail cache is only an optimization, so ignore errors.
+            with suppress(OSError):
+                temporary_file_path.unlink(missing_ok=True)
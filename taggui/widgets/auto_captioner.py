@@ -1,21 +1,28 @@
 import gc
+import os
 import re
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from enum import Enum, auto
+from functools import cache, partial
 from pathlib import Path
 
 import torch
 from PIL import Image as PilImage
 from PIL.ImageOps import exif_transpose
-from PySide6.QtCore import QModelIndex, QSettings, QThread, Qt, Signal, Slot
-from PySide6.QtGui import QFontMetrics, QTextCursor
+from PySide6.QtCore import (QModelIndex, QSettings, QThread, QTimer, Qt,
+                            Signal, Slot)
+from PySide6.QtGui import QFontMetrics, QShowEvent, QTextCursor
 from PySide6.QtWidgets import (QAbstractScrollArea, QDockWidget, QFormLayout,
                                QFrame, QHBoxLayout, QLabel, QLineEdit,
                                QMessageBox, QPlainTextEdit, QProgressBar,
                                QScrollArea, QVBoxLayout, QWidget)
-from transformers import (AutoModelForCausalLM, AutoModelForVision2Seq,
-                          AutoProcessor, BatchFeature, BitsAndBytesConfig,
-                          LlamaTokenizer)
+from transformers import (AutoConfig, AutoModelForCausalLM,
+                          AutoModelForVision2Seq, AutoProcessor, BatchFeature,
+                          BitsAndBytesConfig, LlamaTokenizer, TextStreamer)
+from transformers.utils import is_flash_attn_2_available
 
 from models.image_list_model import ImageListModel
 from utils.big_widgets import BigCheckBox, TallPushButton
@@ -43,6 +50,23 @@ MODELS = [
     'Salesforce/blip2-flan-t5-xxl',
     'microsoft/kosmos-2-patch14-224'
 ]
+# The number of threads used to load images while captions are being
+# generated.
+IMAGE_LOADING_THREAD_COUNT = 2
+# The number of milliseconds to wait after the caption settings are changed
+# before saving them.
+CAPTION_SETTINGS_SAVING_DELAY = 300
+# The number of milliseconds for which text that is outputted to the console
+# text edit is collected before it is added, so that the text edit is not
+# updated for every line of a chatty output.
+CONSOLE_TEXT_EDIT_UPDATE_DELAY = 50
+# Older lines are removed from the console text edit when it has more lines
+# than this.
+CONSOLE_TEXT_EDIT_MAX_LINE_COUNT = 500
+# Parts of the messages of the errors that `from_pretrained()` raises when a
+# model does not support the requested attention implementation.
+ATTENTION_IMPLEMENTATION_ERROR_TEXTS = ('does not support Flash Attention',
+                                        'scaled_dot_product_attention')
 
 
 # `StrEnum` is a Python 3.11 feature that can be used here.
@@ -59,6 +83,12 @@ class Device(str, Enum):
     CPU = 'CPU'
 
 
+class Quantization(str, Enum):
+    NONE = 'None'
+    EIGHT_BIT = '8-bit'
+    FOUR_BIT = '4-bit'
+
+
 class ModelType(Enum):
     LLAVA = auto()
     KOSMOS = auto()
@@ -66,6 +96,18 @@ class ModelType(Enum):
     OTHER = auto()
 
 
+@dataclass(frozen=True)
+class ModelLoadingSettings:
+    """
+    The settings that a model is loaded with. A loaded model is reused as long
+    as these settings stay the same.
+    """
+    model_id: str
+    device_type: str
+    quantization: Quantization
+    compile_model: bool
+
+
 def set_text_edit_height(text_edit: QPlainTextEdit, line_count: int):
     """
     Set the height of a text edit to the height of a given number of lines.
@@ -88,27 +130,53 @@ class HorizontalLine(QFrame):
         self.setFrameShadow(QFrame.Shadow.Raised)
 
 
-def get_directory_paths(directory_path: Path) -> list[Path]:
+def get_model_directory_paths(directory_path: Path) -> list[Path]:
+    """
+    Get the paths of all directories that contain a `config.json` file in a
+    directory, including the directory itself and its subdirectories. The
+    subdirectories of model directories are not searched.
+    """
+    model_directory_paths = []
+    unsearched_directory_paths = [directory_path]
+    while unsearched_directory_paths:
+        directory_path = unsearched_directory_paths.pop()
+        subdirectory_paths = []
+        is_model_directory = False
+        try:
+            # `os.scandir()` is used instead of `Path.iterdir()` because it
+            # gets the file types without an extra system call per entry.
+            with os.scandir(directory_path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        subdirectory_paths.append(Path(entry.path))
+                    elif entry.name == 'config.json' and entry.is_file():
+                        is_model_directory = True
+        except OSError:
+            continue
+        if is_model_directory:
+            model_directory_paths.append(directory_path)
+        else:
+            unsearched_directory_paths.extend(subdirectory_paths)
+    return model_directory_paths
+
+
+@cache
+def is_bitsandbytes_available() -> bool:
     """
-    Recursively get all directory paths in a directory, including those in
-    subdirectories.
+    Check whether `bitsandbytes` can be imported. Importing it is slow because
+    it loads the CUDA libraries, so this is only done when a GPU is selected.
     """
-    directory_paths = [directory_path]
-    for path in directory_path.iterdir():
-        if path.is_dir():
-            directory_paths.extend(get_directory_paths(path))
-    return directory_paths
+    try:
+        import bitsandbytes
+        return True
+    except (ImportError, RuntimeError):
+        return False
 
 
 class CaptionSettingsForm(QVBoxLayout):
     def __init__(self, settings: QSettings):
         super().__init__()
         self.settings = settings
-        try:
-            import bitsandbytes
-            self.is_bitsandbytes_available = True
-        except RuntimeError:
-            self.is_bitsandbytes_available = False
         self.basic_settings_form = QFormLayout()
         self.basic_settings_form.setRowWrapPolicy(
             QFormLayout.RowWrapPolicy.WrapAllRows)
@@ -136,14 +204,15 @@ class CaptionSettingsForm(QVBoxLayout):
         self.basic_settings_form.addRow('Model', self.model_combo_box)
         self.basic_settings_form.addRow('Device', self.device_combo_box)
 
-        self.load_in_4_bit_container = QWidget()
-        self.load_in_4_bit_layout = QHBoxLayout()
-        self.load_in_4_bit_layout.setAlignment(Qt.AlignLeft)
-        self.load_in_4_bit_layout.setContentsMargins(0, 0, 0, 0)
-        self.load_in_4_bit_check_box = BigCheckBox()
-        self.load_in_4_bit_layout.addWidget(QLabel('Load in 4-bit'))
-        self.load_in_4_bit_layout.addWidget(self.load_in_4_bit_check_box)
-        self.load_in_4_bit_container.setLayout(self.load_in_4_bit_layout)
+        self.quantization_container = QWidget()
+        self.quantization_layout = QHBoxLayout()
+        self.quantization_layout.setAlignment(Qt.AlignLeft)
+        self.quantization_layout.setContentsMargins(0, 0, 0, 0)
+        self.quantization_combo_box = FocusedScrollComboBox()
+        self.quantization_combo_box.addItems(list(Quantization))
+        self.quantization_layout.addWidget(QLabel('Quantization'))
+        self.quantization_layout.addWidget(self.quantization_combo_box)
+        self.quantization_container.setLayout(self.quantization_layout)
 
         self.remove_tag_separators_container = QWidget()
         self.remove_tag_separators_layout = QHBoxLayout()
@@ -190,6 +259,10 @@ class CaptionSettingsForm(QVBoxLayout):
         self.repetition_penalty_spin_box.setSingleStep(0.01)
         self.no_repeat_ngram_size_spin_box = FocusedScrollSpinBox()
         self.no_repeat_ngram_size_spin_box.setRange(0, 5)
+        self.batch_size_spin_box = FocusedScrollSpinBox()
+        self.batch_size_spin_box.setRange(1, 16)
+        self.compile_model_check_box = BigCheckBox()
+        self.preload_model_check_box = BigCheckBox()
         advanced_settings_form.addRow('Minimum tokens',
                                       self.min_new_token_count_spin_box)
         advanced_settings_form.addRow('Maximum tokens',
@@ -208,10 +281,15 @@ class CaptionSettingsForm(QVBoxLayout):
                                       self.repetition_penalty_spin_box)
         advanced_settings_form.addRow('No repeat n-gram size',
                                       self.no_repeat_ngram_size_spin_box)
+        advanced_settings_form.addRow('Batch size', self.batch_size_spin_box)
+        advanced_settings_form.addRow('Compile model (GPU only)',
+                                      self.compile_model_check_box)
+        advanced_settings_form.addRow('Preload model',
+                                      self.preload_model_check_box)
         self.advanced_settings_form_container.hide()
 
         self.addLayout(self.basic_settings_form)
-        self.addWidget(self.load_in_4_bit_container)
+        self.addWidget(self.quantization_container)
         self.addWidget(self.remove_tag_separators_container)
         self.addWidget(HorizontalLine())
         self.addWidget(self.toggle_advanced_settings_form_button)
@@ -226,48 +304,64 @@ class CaptionSettingsForm(QVBoxLayout):
             self.max_new_token_count_spin_box.setMinimum)
         self.max_new_token_count_spin_box.valueChanged.connect(
             self.min_new_token_count_spin_box.setMaximum)
-        # Save the caption settings when any of them is changed.
-        self.prompt_text_edit.textChanged.connect(self.save_caption_settings)
-        self.caption_start_line_edit.textChanged.connect(
+        # Save the caption settings when any of them is changed. The settings
+        # are saved after a short delay so that a burst of changes, such as
+        # typing the prompt, is saved only once.
+        self.caption_settings_saving_timer = QTimer(self)
+        self.caption_settings_saving_timer.setSingleShot(True)
+        self.caption_settings_saving_timer.setInterval(
+            CAPTION_SETTINGS_SAVING_DELAY)
+        self.caption_settings_saving_timer.timeout.connect(
             self.save_caption_settings)
+        self.last_saved_caption_settings = None
+        self.prompt_text_edit.textChanged.connect(
+            self.schedule_caption_settings_saving)
+        self.caption_start_line_edit.textChanged.connect(
+            self.schedule_caption_settings_saving)
         self.forced_words_line_edit.textChanged.connect(
-            self.save_caption_settings)
+            self.schedule_caption_settings_saving)
         self.caption_position_combo_box.currentTextChanged.connect(
-            self.save_caption_settings)
+            self.schedule_caption_settings_saving)
         self.model_combo_box.currentTextChanged.connect(
-            self.save_caption_settings)
+            self.schedule_caption_settings_saving)
         self.device_combo_box.currentTextChanged.connect(
-            self.save_caption_settings)
+            self.schedule_caption_settings_saving)
         self.device_combo_box.currentTextChanged.connect(
-            self.set_load_in_4_bit_visibility)
-        self.load_in_4_bit_check_box.stateChanged.connect(
-            self.save_caption_settings)
+            self.set_quantization_visibility)
+        self.quantization_combo_box.currentTextChanged.connect(
+            self.schedule_caption_settings_saving)
         self.remove_tag_separators_check_box.stateChanged.connect(
-            self.save_caption_settings)
+            self.schedule_caption_settings_saving)
         self.min_new_token_count_spin_box.valueChanged.connect(
-            self.save_caption_settings)
+            self.schedule_caption_settings_saving)
         self.max_new_token_count_spin_box.valueChanged.connect(
-            self.save_caption_settings)
+            self.schedule_caption_settings_saving)
         self.beam_count_spin_box.valueChanged.connect(
-            self.save_caption_settings)
+            self.schedule_caption_settings_saving)
         self.length_penalty_spin_box.valueChanged.connect(
-            self.save_caption_settings)
+            self.schedule_caption_settings_saving)
         self.use_sampling_check_box.stateChanged.connect(
-            self.save_caption_settings)
+            self.schedule_caption_settings_saving)
         self.temperature_spin_box.valueChanged.connect(
-            self.save_caption_settings)
-        self.top_k_spin_box.valueChanged.connect(self.save_caption_settings)
-        self.top_p_spin_box.valueChanged.connect(self.save_caption_settings)
+            self.schedule_caption_settings_saving)
+        self.top_k_spin_box.valueChanged.connect(
+            self.schedule_caption_settings_saving)
+        self.top_p_spin_box.valueChanged.connect(
+            self.schedule_caption_settings_saving)
         self.repetition_penalty_spin_box.valueChanged.connect(
-            self.save_caption_settings)
+            self.schedule_caption_settings_saving)
         self.no_repeat_ngram_size_spin_box.valueChanged.connect(
-            self.save_caption_settings)
+            self.schedule_caption_settings_saving)
+        self.batch_size_spin_box.valueChanged.connect(
+            self.schedule_caption_settings_saving)
+        self.compile_model_check_box.stateChanged.connect(
+            self.schedule_caption_settings_saving)
+        self.preload_model_check_box.stateChanged.connect(
+            self.schedule_caption_settings_saving)
 
         # Restore previous caption settings.
         self.load_caption_settings()
-        if not self.is_bitsandbytes_available:
-            self.load_in_4_bit_check_box.setChecked(False)
-        self.set_load_in_4_bit_visibility(self.device_combo_box.currentText())
+        self.set_quantization_visibility(self.device_combo_box.currentText())
 
     def get_local_model_paths(self) -> list[str]:
         models_directory_path: str = self.settings.value(
@@ -279,11 +373,10 @@ class CaptionSettingsForm(QVBoxLayout):
             return []
         print(f'Loading local auto-captioning model paths under '
               f'{models_directory_path}...')
-        directory_paths = get_directory_paths(models_directory_path)
         model_directory_paths = [
             str(directory_path.relative_to(models_directory_path))
-            for directory_path in directory_paths
-            if (directory_path / 'config.json').is_file()
+            for directory_path
+            in get_model_directory_paths(models_directory_path)
         ]
         model_directory_paths.sort()
         print(f'Loaded {len(model_directory_paths)} model '
@@ -291,10 +384,23 @@ class CaptionSettingsForm(QVBoxLayout):
         return model_directory_paths
 
     @Slot(str)
-    def set_load_in_4_bit_visibility(self, device: str):
-        is_load_in_4_bit_available = (self.is_bitsandbytes_available
-                                      and device == Device.GPU)
-        self.load_in_4_bit_container.setVisible(is_load_in_4_bit_available)
+    def set_quantization_visibility(self, device: str):
+        # Models can only be quantized to 4-bit on GPUs.
+        four_bit_item = self.quantization_combo_box.model().item(
+            self.quantization_combo_box.findText(Quantization.FOUR_BIT))
+        four_bit_item.setEnabled(device == Device.GPU)
+        if device != Device.GPU:
+            if (self.quantization_combo_box.currentText()
+                    == Quantization.FOUR_BIT):
+                self.quantization_combo_box.setCurrentText(Quantization.NONE)
+            # Models are quantized with PyTorch instead of `bitsandbytes` on
+            # CPUs, so quantization is always available.
+            self.quantization_container.setVisible(True)
+            return
+        is_quantization_available = is_bitsandbytes_available()
+        if not is_quantization_available:
+            self.quantization_combo_box.setCurrentText(Quantization.NONE)
+        self.quantization_container.setVisible(is_quantization_available)
 
     @Slot()
     def toggle_advanced_settings_form(self):
@@ -323,10 +429,20 @@ class CaptionSettingsForm(QVBoxLayout):
             caption_settings.get('model', MODELS[0]))
         self.device_combo_box.setCurrentText(
             caption_settings.get('device', Device.GPU))
-        self.load_in_4_bit_check_box.setChecked(
-            caption_settings.get('load_in_4_bit', True))
+        # Older versions only had a setting for loading models in 4-bit.
+        default_quantization = (Quantization.FOUR_BIT
+                                if caption_settings.get('load_in_4_bit', True)
+                                else Quantization.NONE)
+        self.quantization_combo_box.setCurrentText(
+            caption_settings.get('quantization', default_quantization))
         self.remove_tag_separators_check_box.setChecked(
             caption_settings.get('remove_tag_separators', True))
+        self.batch_size_spin_box.setValue(
+            caption_settings.get('batch_size', 1))
+        self.compile_model_check_box.setChecked(
+            caption_settings.get('compile_model', False))
+        self.preload_model_check_box.setChecked(
+            caption_settings.get('preload_model', False))
         generation_parameters = caption_settings.get('generation_parameters',
                                                      {})
         self.min_new_token_count_spin_box.setValue(
@@ -356,9 +472,12 @@ class CaptionSettingsForm(QVBoxLayout):
             'caption_position': self.caption_position_combo_box.currentText(),
             'model': self.model_combo_box.currentText(),
             'device': self.device_combo_box.currentText(),
-            'load_in_4_bit': self.load_in_4_bit_check_box.isChecked(),
+            'quantization': self.quantization_combo_box.currentText(),
             'remove_tag_separators':
                 self.remove_tag_separators_check_box.isChecked(),
+            'batch_size': self.batch_size_spin_box.value(),
+            'compile_model': self.compile_model_check_box.isChecked(),
+            'preload_model': self.preload_model_check_box.isChecked(),
             'generation_parameters': {
                 'min_new_tokens': self.min_new_token_count_spin_box.value(),
                 'max_new_tokens': self.max_new_token_count_spin_box.value(),
@@ -374,10 +493,19 @@ class CaptionSettingsForm(QVBoxLayout):
             }
         }
 
+    @Slot()
+    def schedule_caption_settings_saving(self):
+        # Restart the timer if it is already running.
+        self.caption_settings_saving_timer.start()
+
     @Slot()
     def save_caption_settings(self):
+        self.caption_settings_saving_timer.stop()
         caption_settings = self.get_caption_settings()
+        if caption_settings == self.last_saved_caption_settings:
+            return
         self.settings.setValue('caption_settings', caption_settings)
+        self.last_saved_caption_settings = caption_settings
 
 
 def format_cogvlm_prompt(prompt: str, caption_start: str) -> str:
@@ -387,6 +515,17 @@ def format_cogvlm_prompt(prompt: str, caption_start: str) -> str:
     return prompt
 
 
+def get_generated_prompt(prompt: str, model_type: ModelType) -> str:
+    """Get the prompt as it appears at the start of the generated text."""
+    if model_type == ModelType.LLAVA:
+        return prompt.replace('<image>', ' ')
+    if model_type == ModelType.KOSMOS:
+        return prompt.replace('<grounding>', '')
+    if model_type == ModelType.COGVLM:
+        return f'Question: {prompt} Answer:'
+    return prompt
+
+
 def get_forced_words_ids(forced_words_string: str, model_type: ModelType,
                          processor) -> list[list[list[int]]] | None:
     if not forced_words_string.strip():
@@ -404,6 +543,100 @@ def get_forced_words_ids(forced_words_string: str, model_type: ModelType,
     return forced_words_ids
 
 
+def get_model_image_size(model_type: ModelType, model,
+                         processor) -> int | None:
+    """
+    Get the largest side length that the processor resizes images to, or
+    `None` if it is unknown.
+    """
+    if model_type == ModelType.COGVLM:
+        vision_config = getattr(model.config, 'vision_config', None)
+        if isinstance(vision_config, dict):
+            return vision_config.get('image_size')
+        return None
+    image_processor = getattr(processor, 'image_processor', None)
+    size = getattr(image_processor, 'size', None)
+    if isinstance(size, dict):
+        return max(size.values(), default=None)
+    if isinstance(size, int):
+        return size
+    return None
+
+
+def load_pil_image(image_path: Path, model_type: ModelType,
+                   image_size: int | None) -> PilImage.Image:
+    pil_image = PilImage.open(image_path)
+    if image_size:
+        # Let the JPEG decoder scale the image down while decoding it, as long
+        # as it stays larger than the size that the processor resizes it to.
+        # This does nothing for other formats.
+        pil_image.draft(None, (image_size, image_size))
+    # Rotate the image according to the orientation tag.
+    exif_transpose(pil_image, in_place=True)
+    if model_type == ModelType.COGVLM and pil_image.mode != 'RGB':
+        # CogVLM requires a 3-channel image.
+        pil_image = pil_image.convert('RGB')
+    # Decode the image now instead of when it is first used.
+    pil_image.load()
+    return pil_image
+
+
+def move_to_device(tensor: torch.Tensor, device: torch.device,
+                   dtype: torch.dtype | None = None) -> torch.Tensor:
+    """
+    Move a tensor to a device, converting it to `dtype` if it is a floating
+    point tensor. Tensors are copied to GPUs from pinned memory so that the
+    copy does not block the thread.
+    """
+    if device.type == 'cuda':
+        tensor = tensor.pin_memory()
+    if dtype and tensor.is_floating_point():
+        return tensor.to(device, dtype=dtype, non_blocking=True)
+    return tensor.to(device, non_blocking=True)
+
+
+def free_model_memory():
+    """
+    Garbage collect models that are no longer referenced and return the
+    memory that PyTorch cached for them to the GPU, so that it can be used by
+    other models and programs.
+    """
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+        torch.cuda.ipc_collect()
+
+
+def compile_model_forward(model):
+    """
+    Compile the forward pass of a model, which is run once for every generated
+    token.
+    """
+    try:
+        # `dynamic=True` prevents recompiling for every input length. The
+        # model is compiled lazily the first time it is run, so the first
+        # caption takes longer to generate.
+        model.forward = torch.compile(model.forward, dynamic=True)
+    except RuntimeError as exception:
+        # For example, `torch.compile()` is not supported on Windows.
+        print(f'Failed to compile the model: {exception}')
+
+
+def quantize_model_on_cpu(model):
+    """
+    Quantize the weights of the linear layers of a model to 8-bit integers.
+    The activations are quantized dynamically while the model is run, which
+    makes the matrix multiplications faster on CPUs.
+    """
+    if getattr(model.config, 'quantization_config', None):
+        print('The model is already quantized.')
+        return
+    # Quantize in place so that a second copy of the model does not have to
+    # fit in memory.
+    torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear},
+                                           dtype=torch.qint8, inplace=True)
+
+
 def add_caption_to_tags(tags: list[str], caption: str,
                         caption_position: CaptionPosition) -> list[str]:
     """Add a caption to a list of tags and return the new list."""
@@ -426,25 +659,70 @@ def add_caption_to_tags(tags: list[str], caption: str,
     return tags
 
 
-class CaptionThread(QThread):
+class CaptionStreamer(TextStreamer):
+    """
+    Print the caption while it is being generated. Each time more text is
+    generated, the previously printed part of the caption is replaced in the
+    console text edit.
+    """
+
+    def __init__(self, tokenizer, caption_start: str,
+                 tokenizer_lock: threading.Lock):
+        # Skip the prompt, which is passed to the streamer before the
+        # generated tokens.
+        super().__init__(tokenizer, skip_prompt=True,
+                         skip_special_tokens=True)
+        self.caption_start = caption_start.strip()
+        # Held while the tokens are decoded, because the tokenizer can be
+        # used in another thread at the same time.
+        self.tokenizer_lock = tokenizer_lock
+        self.generated_text = ''
+        self.is_caption_printed = False
+
+    def put(self, value: torch.Tensor):
+        with self.tokenizer_lock:
+            super().put(value)
+
+    def end(self):
+        with self.tokenizer_lock:
+            super().end()
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        self.generated_text += text
+        partial_caption = f'{self.caption_start} {self.generated_text.strip()}'
+        # Line breaks are replaced so that the partial caption is a single
+        # line of text, which can be replaced by moving the cursor up once.
+        partial_caption = ' '.join(partial_caption.strip().splitlines())
+        if not partial_caption:
+            return
+        if self.is_caption_printed:
+            # '\x1b[A' is the ANSI escape sequence for moving the cursor up.
+            print('\x1b[A', end='')
+        print(partial_caption)
+        self.is_caption_printed = True
+
+
+class ModelThread(QThread):
+    """
+    Base class for threads that load a captioning model. The processor and
+    model are stored in the parent `AutoCaptioner` so that they can be reused.
+    """
     text_outputted = Signal(str)
     clear_console_text_edit_requested = Signal()
-    # The image index, the caption, and the tags with the caption added. The
-    # third parameter must be declared as `list` instead of `list[str]` for it
-    # to work.
-    caption_generated = Signal(QModelIndex, str, list)
-    progress_bar_update_requested = Signal(int)
 
-    def __init__(self, parent, image_list_model: ImageListModel,
-                 selected_image_indices: list[QModelIndex],
-                 caption_settings: dict, tag_separator: str,
+    def __init__(self, parent, caption_settings: dict,
                  models_directory_path: Path | None):
         super().__init__(parent)
-        self.image_list_model = image_list_model
-        self.selected_image_indices = selected_image_indices
         self.caption_settings = caption_settings
-        self.tag_separator = tag_separator
         self.models_directory_path = models_directory_path
+        # The text that has been written since the last line break.
+        self.unwritten_text = ''
+        self.finished.connect(self.flush)
+
+    def get_device(self) -> torch.device:
+        if self.caption_settings['device'] == Device.CPU:
+            return torch.device('cpu')
+        return torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
 
     def get_model_type(self) -> ModelType:
         model_id = self.caption_settings['model']
@@ -463,16 +741,23 @@ class CaptionThread(QThread):
         processor = self.parent().processor
         model = self.parent().model
         model_id = self.caption_settings['model']
-        # Only GPUs support 4-bit quantization.
-        load_in_4_bit = (self.caption_settings['load_in_4_bit']
+        quantization = self.caption_settings['quantization']
+        # On CPUs, models can only be quantized to 8-bit, with PyTorch's
+        # dynamic quantization instead of `bitsandbytes`. This is also the
+        # case when a GPU is selected but not available.
+        if device.type != 'cuda' and quantization != Quantization.EIGHT_BIT:
+            quantization = Quantization.NONE
+        # Compiling requires Triton, which only supports GPUs.
+        compile_model = (self.caption_settings['compile_model']
                          and device.type == 'cuda')
         if self.models_directory_path:
             config_path = self.models_directory_path / model_id / 'config.json'
             if config_path.is_file():
                 model_id = str(self.models_directory_path / model_id)
-        if (model and self.parent().model_id == model_id
-                and self.parent().model_device_type == device.type
-                and self.parent().is_model_loaded_in_4_bit == load_in_4_bit):
+        model_loading_settings = ModelLoadingSettings(
+            model_id, device.type, quantization, compile_model)
+        if (model and self.parent().model_loading_settings
+                == model_loading_settings):
             return processor, model
         # Load the new processor and model.
         if model:
@@ -482,7 +767,7 @@ class CaptionThread(QThread):
             self.parent().model = None
             del processor
             del model
-            gc.collect()
+            free_model_memory()
         self.clear_console_text_edit_requested.emit()
         print(f'Loading {model_id}...')
         if model_type == ModelType.COGVLM:
@@ -491,31 +776,141 @@ class CaptionThread(QThread):
             processor = AutoProcessor.from_pretrained(model_id,
                                                       trust_remote_code=True)
         self.parent().processor = processor
-        if load_in_4_bit:
-            quantization_config = BitsAndBytesConfig(
-                load_in_4bit=True,
-                bnb_4bit_compute_dtype=torch.float16
-            )
-            dtype_argument = {}
-        else:
-            quantization_config = None
-            dtype_argument = ({'torch_dtype': torch.float16}
-                              if device.type == 'cuda' else {})
+        dtype_argument = {}
+        if device.type == 'cuda':
+            # Use half precision on GPUs. `bfloat16` has the same range as
+            # `float32`, so unlike `float16` it does not overflow, and it is
+            # at least as fast on GPUs that support it.
+            dtype = (torch.bfloat16 if torch.cuda.is_bf16_supported()
+                     else torch.float16)
+            dtype_argument['torch_dtype'] = dtype
+        quantization_config = None
+        if device.type == 'cuda' and quantization != Quantization.NONE:
+            config = AutoConfig.from_pretrained(model_id,
+                                                trust_remote_code=True)
+            if getattr(config, 'quantization_config', None):
+                # Models that are already quantized, for example with GPTQ or
+                # AWQ, are loaded with their own quantization configuration.
+                print(f'{model_id} is already quantized.')
+            elif quantization == Quantization.EIGHT_BIT:
+                quantization_config = BitsAndBytesConfig(load_in_8bit=True)
+            else:
+                # Use the NF4 data type, which is better suited to normally
+                # distributed weights than the default FP4, and also quantize
+                # the quantization constants to save more memory.
+                quantization_config = BitsAndBytesConfig(
+                    load_in_4bit=True,
+                    bnb_4bit_quant_type='nf4',
+                    bnb_4bit_use_double_quant=True,
+                    bnb_4bit_compute_dtype=dtype
+                )
         model_class = (AutoModelForCausalLM
                        if model_type == ModelType.COGVLM
                        else AutoModelForVision2Seq)
-        model = model_class.from_pretrained(
-            model_id, device_map=device, trust_remote_code=True,
-            quantization_config=quantization_config, **dtype_argument)
-        if not load_in_4_bit:
-            model.to(device)
+        # `device_map` makes the weights load directly onto the device, so the
+        # model does not have to be moved afterwards.
+        model_arguments = {
+            'device_map': device,
+            'trust_remote_code': True,
+            'quantization_config': quantization_config,
+            **dtype_argument
+        }
+        # Use a fused attention implementation if possible. CogVLM uses its
+        # own attention implementation.
+        model = None
+        if model_type != ModelType.COGVLM:
+            attention_implementation = (
+                'flash_attention_2'
+                if device.type == 'cuda' and is_flash_attn_2_available()
+                else 'sdpa')
+            try:
+                model = model_class.from_pretrained(
+                    model_id, attn_implementation=attention_implementation,
+                    **model_arguments)
+            except ValueError as exception:
+                # Only retry without the attention implementation if the
+                # model does not support it. Other errors would make the model
+                # load again just to fail the same way.
+                if not any(text in str(exception) for text
+                           in ATTENTION_IMPLEMENTATION_ERROR_TEXTS):
+                    raise
+                print(exception)
+        if model is None:
+            model = model_class.from_pretrained(model_id, **model_arguments)
         model.eval()
+        if device.type == 'cpu' and quantization != Quantization.NONE:
+            quantize_model_on_cpu(model)
+        if compile_model:
+            compile_model_forward(model)
         self.parent().model = model
-        self.parent().model_id = model_id
-        self.parent().model_device_type = device.type
-        self.parent().is_model_loaded_in_4_bit = load_in_4_bit
+        self.parent().model_loading_settings = model_loading_settings
         return processor, model
 
+    def write(self, text: str):
+        """
+        Output the written text line by line instead of for every call, so
+        that, for example, `print()` does not output the text and the newline
+        separately.
+        """
+        # '\x1b[A' is the ANSI escape sequence for moving the cursor up. It
+        # affects the next line, so it is output immediately.
+        if text == '\x1b[A':
+            self.flush()
+            self.text_outputted.emit(text)
+            return
+        self.unwritten_text += text
+        # Progress bars use carriage returns instead of newlines to
+        # overwrite the previous line.
+        line_end_index = max(self.unwritten_text.rfind('\n'),
+                             self.unwritten_text.rfind('\r'))
+        if line_end_index == -1:
+            return
+        lines = self.unwritten_text[:line_end_index + 1]
+        self.unwritten_text = self.unwritten_text[line_end_index + 1:]
+        self.text_outputted.emit(lines)
+
+    @Slot()
+    def flush(self):
+        if not self.unwritten_text:
+            return
+        text = self.unwritten_text
+        self.unwritten_text = ''
+        self.text_outputted.emit(text)
+
+
+class ModelLoadingThread(ModelThread):
+    """Load the captioning model before the first caption is generated."""
+
+    def run(self):
+        # Redirect `stdout` and `stderr` so that the outputs are
+        # displayed in the console text edit.
+        sys.stdout = self
+        sys.stderr = self
+        self.load_processor_and_model(self.get_device(),
+                                      self.get_model_type())
+        print('Model loaded.')
+
+
+class CaptionThread(ModelThread):
+    # The image index, the caption, and the tags with the caption added. The
+    # third parameter must be declared as `list` instead of `list[str]` for it
+    # to work.
+    caption_generated = Signal(QModelIndex, str, list)
+    progress_bar_update_requested = Signal(int)
+
+    def __init__(self, parent, image_list_model: ImageListModel,
+                 selected_image_indices: list[QModelIndex],
+                 caption_settings: dict, tag_separator: str,
+                 models_directory_path: Path | None):
+        super().__init__(parent, caption_settings, models_directory_path)
+        self.image_list_model = image_list_model
+        self.selected_image_indices = selected_image_indices
+        self.tag_separator = tag_separator
+        # The processor is used to preprocess the next batch in another
+        # thread while the current batch is being generated and decoded, but
+        # processors are not guaranteed to be thread-safe.
+        self.processor_lock = threading.Lock()
+
     def get_processed_prompt(self, model_type: ModelType) -> str:
         prompt = self.caption_settings['prompt']
         if model_type == ModelType.LLAVA:
@@ -529,9 +924,10 @@ class CaptionThread(QThread):
                 prompt = 'Describe the image in twenty words or less.'
         return prompt
 
-    def get_model_inputs(self, prompt: str, image: Image,
+    def get_model_inputs(self, prompt: str, pil_images: list[PilImage.Image],
                          model_type: ModelType, device: torch.device, model,
                          processor) -> BatchFeature | dict:
+        """Get the inputs for captioning a batch of images at once."""
         # Prepare the input text.
         caption_start = self.caption_settings['caption_start']
         if model_type == ModelType.COGVLM:
@@ -541,63 +937,167 @@ class CaptionThread(QThread):
             text = f'{prompt} {caption_start}'
         else:
             text = prompt + caption_start
-        # Load the image.
-        pil_image = PilImage.open(image.path)
-        # Rotate the image according to the orientation tag.
-        pil_image = exif_transpose(pil_image)
-        if model_type == ModelType.COGVLM:
-            # CogVLM requires a 3-channel image.
-            pil_image = pil_image.convert('RGB')
         # Convert the text and image to model inputs.
-        dtype_argument = ({'dtype': torch.float16}
-                          if device.type == 'cuda' else {})
+        # The image inputs have to have the same data type as the model.
+        dtype = model.dtype
         if model_type == ModelType.COGVLM:
             # Monkey-patch the CogVLM prompt formatting function to include the
             # `caption_start` text.
-            cogvlm_module = next(
-                (module for module_name, module in sys.modules.items()
-                 if 'modeling_cogvlm' in module_name))
+            # The model class is defined in the `modeling_cogvlm` module.
+            cogvlm_module = sys.modules[model.__class__.__module__]
             cogvlm_module._history_to_prompt = (
                 lambda _, __, prompt_:
                 format_cogvlm_prompt(prompt_, caption_start))
-            model_inputs = model.build_conversation_input_ids(
-                processor, query=text, history=[], images=[pil_image])
+            image_model_inputs = [
+                model.build_conversation_input_ids(
+                    processor, query=text, history=[], images=[pil_image])
+                for pil_image in pil_images
+            ]
             beam_count = self.caption_settings['generation_parameters'][
                 'num_beams']
+            # The prompt is the same for all the images, so the inputs have
+            # the same length and can be stacked without padding.
             model_inputs = {
-                'input_ids': model_inputs['input_ids'].unsqueeze(0).to(device),
-                'token_type_ids': (model_inputs['token_type_ids'].unsqueeze(0)
-                                   .to(device)),
-                'attention_mask': (model_inputs['attention_mask'].unsqueeze(0)
-                                   .to(device)),
-                'images': [
-                    [model_inputs['images'][0].to(device, **dtype_argument)]
-                    for _ in range(beam_count)
-                ]
+                key: move_to_device(torch.stack([inputs[key] for inputs
+                                                 in image_model_inputs]),
+                                    device)
+                for key in ('input_ids', 'token_type_ids', 'attention_mask')
             }
+            # The inputs are expanded for each beam, so each image has to be
+            # repeated for each beam.
+            image_tensors = [
+                move_to_device(inputs['images'][0], device, dtype)
+                for inputs in image_model_inputs
+            ]
+            model_inputs['images'] = [[image_tensor]
+                                      for image_tensor in image_tensors
+                                      for _ in range(beam_count)]
         else:
-            model_inputs = (processor(text=text, images=pil_image,
-                                      return_tensors='pt')
-                            .to(device, **dtype_argument))
+            # The prompt is the same for all the images, so the texts do not
+            # have to be padded.
+            model_inputs = processor(text=[text] * len(pil_images),
+                                     images=pil_images, return_tensors='pt')
+            model_inputs = BatchFeature({
+                key: move_to_device(tensor, device, dtype)
+                for key, tensor in model_inputs.items()
+            })
         return model_inputs
 
-    def get_caption_from_generated_tokens(
-            self, generated_token_ids: torch.Tensor, prompt: str, processor,
-            model_type: ModelType) -> str:
-        generated_text = processor.batch_decode(
-            generated_token_ids, skip_special_tokens=True)[0]
-        # Postprocess the generated text.
+    def generate_texts(self, prompt: str, pil_images: list[PilImage.Image],
+                       model_type: ModelType, device: torch.device, model,
+                       processor,
+                       forced_words_ids: list[list[list[int]]] | None,
+                       generation_parameters: dict,
+                       model_inputs: BatchFeature | dict | None = None
+                       ) -> list[str]:
+        """
+        Generate the texts for a batch of images. If the GPU runs out of
+        memory, the batch is split in half and each half is generated
+        separately. The model inputs are created from the images if they are
+        not given.
+        """
+        if model_inputs is None:
+            with self.processor_lock:
+                model_inputs = self.get_model_inputs(prompt, pil_images,
+                                                     model_type, device,
+                                                     model, processor)
+        try:
+            with torch.inference_mode():
+                generated_token_ids = model.generate(
+                    **model_inputs, force_words_ids=forced_words_ids,
+                    **generation_parameters)
+        except torch.cuda.OutOfMemoryError:
+            if len(pil_images) == 1:
+                raise
+            generated_token_ids = None
+        if generated_token_ids is None:
+            # This is done outside of the `except` block so that the
+            # exception, which references the tensors that were allocated, is
+            # freed first. The inputs are cleared instead of only deleted
+            # because the caller can still reference them.
+            model_inputs.clear()
+            del model_inputs
+            gc.collect()
+            torch.cuda.empty_cache()
+            print(f'Ran out of GPU memory while captioning {len(pil_images)} '
+                  f'images at once. Trying again with smaller batches...')
+            half_image_count = len(pil_images) // 2
+            first_texts = self.generate_texts(
+                prompt, pil_images[:half_image_count], model_type, device,
+                model, processor, forced_words_ids, generation_parameters)
+            second_texts = self.generate_texts(
+                prompt, pil_images[half_image_count:], model_type, device,
+                model, processor, forced_words_ids, generation_parameters)
+            return first_texts + second_texts
+        with self.processor_lock:
+            return self.decode_generated_token_ids(
+                generated_token_ids, model_inputs['input_ids'], processor)
+
+    def decode_generated_token_ids(self, generated_token_ids: torch.Tensor,
+                                   input_ids: torch.Tensor,
+                                   processor) -> list[str]:
+        # Decoder-only models output the input tokens followed by the new
+        # tokens. Only decode the new tokens instead of decoding the whole
+        # prompt and removing it from the text.
+        input_length = input_ids.shape[1]
+        are_input_ids_generated = (
+            generated_token_ids.shape[1] >= input_length
+            and torch.equal(generated_token_ids[:, :input_length], input_ids))
+        if not are_input_ids_generated:
+            return processor.batch_decode(generated_token_ids,
+                                          skip_special_tokens=True)
+        # The new tokens are decoded together with the last input token,
+        # whose text is then removed, so that the new text is joined to the
+        # caption start the same way as when the whole sequence is decoded.
+        # For example, it can continue a word or start with punctuation.
+        last_input_texts = processor.batch_decode(
+            generated_token_ids[:, input_length - 1:input_length],
+            skip_special_tokens=True)
+        continued_texts = processor.batch_decode(
+            generated_token_ids[:, input_length - 1:],
+            skip_special_tokens=True)
         caption_start = self.caption_settings['caption_start']
-        if model_type == ModelType.LLAVA:
-            prompt = prompt.replace('<image>', ' ')
-        elif model_type == ModelType.KOSMOS:
+        generated_texts = []
+        for image_index, (last_input_text, continued_text) in enumerate(
+                zip(last_input_texts, continued_texts)):
+            if continued_text.startswith(last_input_text):
+                new_text = continued_text[len(last_input_text):]
+            else:
+                # This can happen if the last input token and the first new
+                # token are parts of the same character.
+                new_text = ' ' + processor.batch_decode(
+                    generated_token_ids[image_index:image_index + 1,
+                                        input_length:],
+                    skip_special_tokens=True)[0]
+            generated_texts.append(caption_start + new_text)
+        return generated_texts
+
+    def load_batch(self, images: list[Image],
+                   image_loading_executor: ThreadPoolExecutor, prompt: str,
+                   model_type: ModelType, image_size: int | None,
+                   device: torch.device, model, processor
+                   ) -> tuple[list[PilImage.Image], BatchFeature | dict]:
+        """Load the images of a batch and convert them to model inputs."""
+        pil_images = list(image_loading_executor.map(
+            partial(load_pil_image, model_type=model_type,
+                    image_size=image_size),
+            [image.path for image in images]))
+        with self.processor_lock:
+            model_inputs = self.get_model_inputs(prompt, pil_images,
+                                                 model_type, device, model,
+                                                 processor)
+        return pil_images, model_inputs
+
+    def get_caption_from_generated_text(self, generated_text: str,
+                                        generated_prompt: str, processor,
+                                        model_type: ModelType) -> str:
+        caption_start = self.caption_settings['caption_start']
+        if model_type == ModelType.KOSMOS:
             generated_text, _ = processor.post_process_generation(
                 generated_text)
-            prompt = prompt.replace('<grounding>', '')
-        elif model_type == ModelType.COGVLM:
-            prompt = f'Question: {prompt} Answer:'
-        if prompt.strip() and generated_text.startswith(prompt):
-            caption = generated_text[len(prompt):]
+        if (generated_prompt.strip()
+              and generated_text.startswith(generated_prompt)):
+            caption = generated_text[len(generated_prompt):]
         elif (caption_start.strip()
               and generated_text.startswith(caption_start)):
             caption = generated_text
@@ -622,40 +1122,99 @@ class CaptionThread(QThread):
             print('`Number of beams` must be greater than 1 when `Include in '
                   'caption` is not empty.')
             return
-        if self.caption_settings['device'] == Device.CPU:
-            device = torch.device('cpu')
-        else:
-            device = torch.device('cuda:0' if torch.cuda.is_available()
-                                  else 'cpu')
+        device = self.get_device()
         model_type = self.get_model_type()
         processor, model = self.load_processor_and_model(device, model_type)
         self.clear_console_text_edit_requested.emit()
         print(f'Captioning... (device: {device})')
         prompt = self.get_processed_prompt(model_type)
+        generated_prompt = get_generated_prompt(prompt, model_type)
         caption_position = self.caption_settings['caption_position']
         are_multiple_images_selected = len(self.selected_image_indices) > 1
-        for i, image_index in enumerate(self.selected_image_indices):
-            image: Image = self.image_list_model.data(image_index, Qt.UserRole)
-            model_inputs = self.get_model_inputs(prompt, image, model_type,
-                                                 device, model, processor)
-            forced_words_ids = get_forced_words_ids(forced_words_string,
-                                                    model_type, processor)
-            with torch.inference_mode():
-                generated_token_ids = model.generate(
-                    **model_inputs, force_words_ids=forced_words_ids,
-                    **generation_parameters)
-            caption = self.get_caption_from_generated_tokens(
-                generated_token_ids, prompt, processor, model_type)
-            tags = add_caption_to_tags(image.tags, caption, caption_position)
-            self.caption_generated.emit(image_index, caption, tags)
-            if are_multiple_images_selected:
-                self.progress_bar_update_requested.emit(i + 1)
-            if i == 0:
-                self.clear_console_text_edit_requested.emit()
-            print(f'{image.path.name}:\n{caption}')
-
-    def write(self, text: str):
-        self.text_outputted.emit(text)
+        batch_size = self.caption_settings['batch_size']
+        forced_words_ids = get_forced_words_ids(forced_words_string,
+                                                model_type, processor)
+        # Captions can only be streamed one image at a time and not with beam
+        # search. Kosmos-2 captions are not streamed because the generated
+        # text has to be post-processed before it can be displayed.
+        are_captions_streamed = (batch_size == 1 and beam_count == 1
+                                 and model_type != ModelType.KOSMOS)
+        tokenizer = (processor if model_type == ModelType.COGVLM else
+                     processor.tokenizer)
+        images: list[Image] = [
+            self.image_list_model.data(image_index, Qt.UserRole)
+            for image_index in self.selected_image_indices
+        ]
+        # Load and preprocess the next batch in another thread while the
+        # captions for the current batch are being generated, so that the
+        # device does not have to wait for the images to be decoded, resized,
+        # and copied to it. The images of a batch are decoded in parallel.
+        # Only one batch is preprocessed at a time.
+        image_loading_executor = ThreadPoolExecutor(
+            max_workers=IMAGE_LOADING_THREAD_COUNT)
+        batch_loading_executor = ThreadPoolExecutor(max_workers=1)
+        image_size = get_model_image_size(model_type, model, processor)
+        load_batch = partial(self.load_batch,
+                             image_loading_executor=image_loading_executor,
+                             prompt=prompt, model_type=model_type,
+                             image_size=image_size, device=device,
+                             model=model, processor=processor)
+        captioned_image_count = 0
+        try:
+            next_batch_future = batch_loading_executor.submit(
+                load_batch, images[:batch_size])
+            for batch_start in range(0, len(images), batch_size):
+                # Stop captioning when the application is closed.
+                if self.isInterruptionRequested():
+                    break
+                image_indices = self.selected_image_indices[
+                    batch_start:batch_start + batch_size]
+                batch_images = images[batch_start:batch_start + batch_size]
+                pil_images, model_inputs = next_batch_future.result()
+                next_batch_start = batch_start + batch_size
+                if next_batch_start < len(images):
+                    next_batch_future = batch_loading_executor.submit(
+                        load_batch, images[next_batch_start:
+                                           next_batch_start + batch_size])
+                caption_streamer = None
+                batch_generation_parameters = generation_parameters
+                if are_captions_streamed:
+                    if captioned_image_count == 0:
+                        self.clear_console_text_edit_requested.emit()
+                    print(f'{batch_images[0].path.name}:')
+                    caption_streamer = CaptionStreamer(
+                        tokenizer, self.caption_settings['caption_start'],
+                        self.processor_lock)
+                    batch_generation_parameters = {
+                        **generation_parameters, 'streamer': caption_streamer}
+                generated_texts = self.generate_texts(
+                    prompt, pil_images, model_type, device, model, processor,
+                    forced_words_ids, batch_generation_parameters,
+                    model_inputs)
+                for image_index, image, generated_text in zip(
+                        image_indices, batch_images, generated_texts):
+                    caption = self.get_caption_from_generated_text(
+                        generated_text, generated_prompt, processor,
+                        model_type)
+                    tags = add_caption_to_tags(image.tags, caption,
+                                               caption_position)
+                    self.caption_generated.emit(image_index, caption, tags)
+                    captioned_image_count += 1
+                    if are_multiple_images_selected:
+                        self.progress_bar_update_requested.emit(
+                            captioned_image_count)
+                    if caption_streamer:
+                        # Replace the streamed caption with the final one.
+                        if caption_streamer.is_caption_printed and caption:
+                            print('\x1b[A', end='')
+                        print(caption)
+                        continue
+                    if captioned_image_count == 1:
+                        self.clear_console_text_edit_requested.emit()
+                    print(f'{image.path.name}:\n{caption}')
+        finally:
+            batch_loading_executor.shutdown(cancel_futures=True)
+            image_loading_executor.shutdown(cancel_futures=True)
 
 
 @Slot()
@@ -675,12 +1234,24 @@ class AutoCaptioner(QDockWidget):
         self.settings = get_settings()
         self.processor = None
         self.model = None
-        self.model_id: str | None = None
-        self.model_device_type: str | None = None
-        self.is_model_loaded_in_4_bit = None
+        # The settings that the current model was loaded with.
+        self.model_loading_settings: ModelLoadingSettings | None = None
+        self.model_loading_thread: ModelLoadingThread | None = None
+        self.caption_thread: CaptionThread | None = None
         # Whether the last block of text in the console text edit should be
         # replaced with the next block of text that is outputted.
         self.replace_last_console_text_edit_block = False
+        # The lines of text that have not been added to the console text edit
+        # yet, and whether the last block of text that is already in it
+        # should be removed before they are added.
+        self.console_text_edit_lines: list[str] = []
+        self.remove_last_console_text_edit_block = False
+        self.console_text_edit_update_timer = QTimer(self)
+        self.console_text_edit_update_timer.setSingleShot(True)
+        self.console_text_edit_update_timer.setInterval(
+            CONSOLE_TEXT_EDIT_UPDATE_DELAY)
+        self.console_text_edit_update_timer.timeout.connect(
+            self.add_console_text_edit_lines)
 
         # Each `QDockWidget` needs a unique object name for saving its state.
         self.setObjectName('auto_captioner')
@@ -694,6 +1265,8 @@ class AutoCaptioner(QDockWidget):
         self.console_text_edit = QPlainTextEdit()
         set_text_edit_height(self.console_text_edit, 4)
         self.console_text_edit.setReadOnly(True)
+        self.console_text_edit.setMaximumBlockCount(
+            CONSOLE_TEXT_EDIT_MAX_LINE_COUNT)
         self.console_text_edit.hide()
         container = QWidget()
         layout = QVBoxLayout(container)
@@ -712,6 +1285,79 @@ class AutoCaptioner(QDockWidget):
 
         self.caption_button.clicked.connect(self.generate_captions)
 
+    def showEvent(self, event: QShowEvent):
+        """
+        Preload the model when the auto-captioner is shown if it is not loaded
+        yet.
+        """
+        super().showEvent(event)
+        caption_settings = self.caption_settings_form.get_caption_settings()
+        if (not caption_settings['preload_model'] or self.model
+                or self.model_loading_thread
+                or (self.caption_thread and self.caption_thread.isRunning())):
+            return
+        model_loading_thread = ModelLoadingThread(
+            self, caption_settings, self.get_models_directory_path())
+        model_loading_thread.text_outputted.connect(
+            self.update_console_text_edit)
+        model_loading_thread.clear_console_text_edit_requested.connect(
+            self.clear_console_text_edit)
+        model_loading_thread.finished.connect(restore_stdout_and_stderr)
+        model_loading_thread.finished.connect(self.remove_model_loading_thread)
+        self.model_loading_thread = model_loading_thread
+        model_loading_thread.start()
+
+    @Slot()
+    def remove_model_loading_thread(self):
+        self.model_loading_thread = None
+
+    @Slot()
+    def start_caption_thread(self):
+        # The caption thread can already have been started if the model
+        # finished loading right after the caption thread was created, and
+        # it is removed if the application is closed while the model is
+        # loading.
+        if (self.caption_thread is None or self.caption_thread.isRunning()
+                or self.caption_thread.isFinished()):
+            return
+        self.caption_thread.start()
+
+    def wait_for_threads(self):
+        """
+        Wait for the model loading thread and the caption thread to finish.
+        Destroying a thread that is still running aborts the application.
+        """
+        if self.caption_thread and not self.caption_thread.isRunning():
+            # Do not start a caption thread that is waiting for the model to
+            # be loaded.
+            self.caption_thread = None
+        if self.model_loading_thread:
+            self.model_loading_thread.wait()
+        if self.caption_thread:
+            # Only the captions for the current batch are finished.
+            self.caption_thread.requestInterruption()
+            self.caption_thread.wait()
+
+    @Slot()
+    def unload_model(self):
+        """Unload the cached processor and model to free up memory."""
+        # The model cannot be unloaded while it is being used.
+        if ((self.model_loading_thread
+             and self.model_loading_thread.isRunning())
+                or (self.caption_thread and self.caption_thread.isRunning())):
+            return
+        if self.model is None:
+            return
+        self.processor = None
+        self.model = None
+        self.model_loading_settings = None
+        free_model_memory()
+
+    def get_models_directory_path(self) -> Path | None:
+        models_directory_path: str = self.settings.value(
+            'models_directory_path', type=str)
+        return Path(models_directory_path) if models_directory_path else None
+
     @Slot(str)
     def update_console_text_edit(self, text: str):
         # '\x1b[A' is the ANSI escape sequence for moving the cursor up.
@@ -721,18 +1367,56 @@ class AutoCaptioner(QDockWidget):
         text = text.strip()
         if not text:
             return
-        if self.console_text_edit.isHidden():
-            self.console_text_edit.show()
         if self.replace_last_console_text_edit_block:
             self.replace_last_console_text_edit_block = False
+            if self.console_text_edit_lines:
+                self.console_text_edit_lines.pop()
+            else:
+                self.remove_last_console_text_edit_block = True
+        self.console_text_edit_lines.append(text)
+        if not self.console_text_edit_update_timer.isActive():
+            self.console_text_edit_update_timer.start()
+
+    @Slot()
+    def add_console_text_edit_lines(self):
+        """
+        Add the collected lines of text to the console text edit in a single
+        edit.
+        """
+        if (not self.console_text_edit_lines
+                and not self.remove_last_console_text_edit_block):
+            return
+        if self.console_text_edit.isHidden():
+            self.console_text_edit.show()
+        scroll_bar = self.console_text_edit.verticalScrollBar()
+        is_scrolled_to_bottom = scroll_bar.value() == scroll_bar.maximum()
+        cursor = QTextCursor(self.console_text_edit.document())
+        cursor.beginEditBlock()
+        cursor.movePosition(QTextCursor.End)
+        if self.remove_last_console_text_edit_block:
+            self.remove_last_console_text_edit_block = False
             # Select and remove the last block of text.
-            self.console_text_edit.moveCursor(QTextCursor.End)
-            self.console_text_edit.moveCursor(QTextCursor.StartOfBlock,
-                                              QTextCursor.KeepAnchor)
-            self.console_text_edit.textCursor().removeSelectedText()
+            cursor.movePosition(QTextCursor.StartOfBlock,
+                                QTextCursor.KeepAnchor)
+            cursor.removeSelectedText()
             # Delete the newline.
-            self.console_text_edit.textCursor().deletePreviousChar()
-        self.console_text_edit.appendPlainText(text)
+            cursor.deletePreviousChar()
+        if self.console_text_edit_lines:
+            if not self.console_text_edit.document().isEmpty():
+                cursor.insertText('\n')
+            cursor.insertText('\n'.join(self.console_text_edit_lines))
+            self.console_text_edit_lines.clear()
+        cursor.endEditBlock()
+        # Keep following the output unless the user has scrolled up.
+        if is_scrolled_to_bottom:
+            scroll_bar.setValue(scroll_bar.maximum())
+
+    @Slot()
+    def clear_console_text_edit(self):
+        self.console_text_edit_update_timer.stop()
+        self.console_text_edit_lines.clear()
+        self.remove_last_console_text_edit_block = False
+        self.console_text_edit.clear()
 
     @Slot()
     def generate_captions(self):
@@ -756,18 +1440,13 @@ class AutoCaptioner(QDockWidget):
             self.progress_bar.setValue(0)
             self.progress_bar.show()
         tag_separator = get_separator(self.settings)
-        models_directory_path: str = self.settings.value(
-            'models_directory_path', type=str)
-        models_directory_path: Path | None = (Path(models_directory_path)
-                                              if models_directory_path
-                                              else None)
         caption_thread = CaptionThread(self, self.image_list_model,
                                        selected_image_indices,
                                        caption_settings, tag_separator,
-                                       models_directory_path)
+                                       self.get_models_directory_path())
         caption_thread.text_outputted.connect(self.update_console_text_edit)
         caption_thread.clear_console_text_edit_requested.connect(
-            self.console_text_edit.clear)
+            self.clear_console_text_edit)
         caption_thread.caption_generated.connect(self.caption_generated)
         caption_thread.progress_bar_update_requested.connect(
             self.progress_bar.setValue)
@@ -775,4 +1454,14 @@ class AutoCaptioner(QDockWidget):
         caption_thread.finished.connect(
             lambda: self.caption_button.setEnabled(True))
         caption_thread.finished.connect(self.progress_bar.hide)
-        caption_thread.start()
+        self.caption_thread = caption_thread
+        # Only one thread can load a model at a time, so wait for the model
+        # that is being preloaded before captioning.
+        if self.model_loading_thread:
+            self.model_loading_thread.finished.connect(
+                self.start_caption_thread)
+            # The model can finish loading before the signal is connected.
+            if self.model_loading_thread.isFinished():
+                self.start_caption_thread()
+        else:
+            caption_thread.start()
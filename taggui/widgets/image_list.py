@@ -1,6 +1,12 @@
+import ctypes
+import re
 import shutil
-from functools import reduce
-from operator import or_
+import sys
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from functools import cache, partial, reduce
+from operator import attrgetter, or_
 from pathlib import Path
 
 from PySide6.QtCore import (QFile, QItemSelection, QItemSelectionModel,
@@ -10,14 +16,140 @@ from PySide6.QtWidgets import (QAbstractItemView, QApplication, QDockWidget,
                                QFileDialog, QLabel, QLineEdit, QListView,
                                QMenu, QMessageBox, QVBoxLayout, QWidget)
 from pyparsing import (CaselessKeyword, CaselessLiteral, Group, OpAssoc,
-                       ParseException, QuotedString, Suppress, Word,
-                       infix_notation, nums, one_of, printables)
+                       ParseException, ParserElement, QuotedString, Suppress,
+                       Word, infix_notation, nums, one_of, printables)
 
 from models.proxy_image_list_model import ProxyImageListModel
 from utils.image import Image
 from utils.settings import get_settings
 from utils.utils import get_confirmation_dialog_reply, pluralize
 
+# The number of threads used to move or copy image files at the same time.
+FILE_OPERATION_THREAD_COUNT = 8
+# The `COINIT_APARTMENTTHREADED` flag of `CoInitializeEx()` on Windows.
+COINIT_APARTMENTTHREADED = 0x2
+# Patterns for the most common filters, which are parsed without the filter
+# text parser because it is much slower. Quotes and parentheses, as well as
+# colons in bare words, are excluded so that anything that the parser could
+# interpret differently falls through to it. So do words that start with an
+# operator keyword, such as `not<a`, which the parser splits into the
+# operator and its operand.
+BARE_WORD_FILTER_PATTERN = re.compile(
+    r'(?!(?:not|and|or)(?![A-Za-z0-9_$]))[^\s()"\':]+', re.IGNORECASE)
+STRING_FILTER_PATTERN = re.compile(r'(tag|caption|name|path):([^\s()"\']+)',
+                                   re.IGNORECASE)
+
+
+def move_image_and_caption_file(image: Image, directory_path: Path):
+    image.path.replace(directory_path / image.path.name)
+    # Not every image has a caption file. Trying to move it saves a system
+    # call compared to checking whether it exists first.
+    with suppress(FileNotFoundError):
+        image.caption_path.replace(directory_path / image.caption_path.name)
+
+
+def copy_image_and_caption_file(image: Image, directory_path: Path):
+    shutil.copy(image.path, directory_path)
+    with suppress(FileNotFoundError):
+        shutil.copy(image.caption_path, directory_path)
+
+
+def initialize_com():
+    """
+    Initialize COM on the current thread. On Windows, Qt moves files to the
+    trash with the shell's `IFileOperation` interface, which needs COM to be
+    initialized on the calling thread.
+    """
+    ctypes.windll.ole32.CoInitializeEx(None, COINIT_APARTMENTTHREADED)
+
+
+def move_image_and_caption_file_to_trash(image: Image):
+    # Try to move the caption file even if moving the image failed.
+    is_image_moved = QFile(image.path).moveToTrash()
+    caption_file = QFile(image.caption_path)
+    if caption_file.exists() and not caption_file.moveToTrash():
+        raise OSError(f'Failed to move {image.caption_path} to the trash.')
+    if not is_image_moved:
+        raise OSError(f'Failed to move {image.path} to the trash.')
+
+
+def split_duplicate_file_name_images(
+        images: list[Image]) -> tuple[list[Image], list[Path]]:
+    """
+    Split images into the images whose image and caption file names are
+    unique and the paths of the other images. Moving or copying images with
+    the same file names from different subdirectories into one directory
+    would make them overwrite each other in an unpredictable order.
+    """
+    file_names = set()
+    unique_file_name_images = []
+    duplicate_file_name_image_paths = []
+    for image in images:
+        # File names are case-insensitive on Windows and macOS.
+        image_file_names = {image.path.name.casefold(),
+                            image.caption_path.name.casefold()}
+        if file_names.isdisjoint(image_file_names):
+            file_names.update(image_file_names)
+            unique_file_name_images.append(image)
+        else:
+            duplicate_file_name_image_paths.append(image.path)
+    return unique_file_name_images, duplicate_file_name_image_paths
+
+
+def get_failed_image_paths(
+        file_operation: Callable[[Image], None], images: list[Image],
+        thread_initializer: Callable[[], None] | None = None) -> list[Path]:
+    """
+    Run a file operation on multiple images in parallel and return the paths
+    of the images for which it raised an `OSError`. `thread_initializer` is
+    called at the start of each worker thread.
+    """
+    with ThreadPoolExecutor(max_workers=FILE_OPERATION_THREAD_COUNT,
+                            initializer=thread_initializer) as executor:
+        futures = [executor.submit(file_operation, image) for image in images]
+    failed_image_paths = []
+    for image, future in zip(images, futures):
+        exception = future.exception()
+        if isinstance(exception, OSError):
+            failed_image_paths.append(image.path)
+        elif exception:
+            raise exception
+    return failed_image_paths
+
+
+@cache
+def get_filter_text_parser() -> ParserElement:
+    """
+    Build the parser for the image list filter text. It is built only once
+    because building it is slow.
+    """
+    # `infix_notation()` parsers backtrack a lot, so caching the results of
+    # parsing subexpressions makes them much faster.
+    ParserElement.enable_packrat()
+    optionally_quoted_string = (QuotedString(quote_char='"', esc_char='\\')
+                                | QuotedString(quote_char="'", esc_char='\\')
+                                | Word(printables, exclude_chars='()'))
+    string_filter_keys = ['tag', 'caption', 'name', 'path']
+    string_filter_expressions = [Group(CaselessLiteral(key) + Suppress(':')
+                                       + optionally_quoted_string)
+                                 for key in string_filter_keys]
+    comparison_operator = one_of('= == != < > <= >=')
+    number_filter_keys = ['tags', 'chars', 'tokens']
+    number_filter_expressions = [Group(CaselessLiteral(key) + Suppress(':')
+                                       + comparison_operator + Word(nums))
+                                 for key in number_filter_keys]
+    string_filter_expressions = reduce(or_, string_filter_expressions)
+    number_filter_expressions = reduce(or_, number_filter_expressions)
+    filter_expressions = (string_filter_expressions
+                          | number_filter_expressions
+                          | optionally_quoted_string)
+    return infix_notation(
+        filter_expressions,
+        # Operator, number of operands, associativity.
+        [(CaselessKeyword('NOT'), 1, OpAssoc.RIGHT),
+         (CaselessKeyword('AND'), 2, OpAssoc.LEFT),
+         (CaselessKeyword('OR'), 2, OpAssoc.LEFT)])
+
 
 class FilterLineEdit(QLineEdit):
     def __init__(self):
@@ -25,36 +157,23 @@ class FilterLineEdit(QLineEdit):
         self.setPlaceholderText('Filter Images')
         self.setStyleSheet('padding: 8px;')
         self.setClearButtonEnabled(True)
-        optionally_quoted_string = (QuotedString(quote_char='"', esc_char='\\')
-                                    | QuotedString(quote_char="'",
-                                                   esc_char='\\')
-                                    | Word(printables, exclude_chars='()'))
-        string_filter_keys = ['tag', 'caption', 'name', 'path']
-        string_filter_expressions = [Group(CaselessLiteral(key) + Suppress(':')
-                                           + optionally_quoted_string)
-                                     for key in string_filter_keys]
-        comparison_operator = one_of('= == != < > <= >=')
-        number_filter_keys = ['tags', 'chars', 'tokens']
-        number_filter_expressions = [Group(CaselessLiteral(key) + Suppress(':')
-                                           + comparison_operator + Word(nums))
-                                     for key in number_filter_keys]
-        string_filter_expressions = reduce(or_, string_filter_expressions)
-        number_filter_expressions = reduce(or_, number_filter_expressions)
-        filter_expressions = (string_filter_expressions
-                              | number_filter_expressions
-                              | optionally_quoted_string)
-        self.filter_text_parser = infix_notation(
-            filter_expressions,
-            # Operator, number of operands, associativity.
-            [(CaselessKeyword('NOT'), 1, OpAssoc.RIGHT),
-             (CaselessKeyword('AND'), 2, OpAssoc.LEFT),
-             (CaselessKeyword('OR'), 2, OpAssoc.LEFT)])
+        self.filter_text_parser = get_filter_text_parser()
 
     def parse_filter_text(self) -> list | str | None:
         filter_text = self.text()
         if not filter_text:
             self.setStyleSheet('padding: 8px;')
             return None
+        stripped_filter_text = filter_text.strip()
+        # Unquoted words in the filter text can only contain ASCII
+        # characters.
+        if stripped_filter_text.isascii():
+            if match := STRING_FILTER_PATTERN.fullmatch(stripped_filter_text):
+                self.setStyleSheet('padding: 8px;')
+                return [match.group(1).lower(), match.group(2)]
+            if BARE_WORD_FILTER_PATTERN.fullmatch(stripped_filter_text):
+                self.setStyleSheet('padding: 8px;')
+                return stripped_filter_text
         try:
             filter_ = self.filter_text_parser.parse_string(
                 filter_text, parse_all=True).as_list()[0]
@@ -140,31 +259,72 @@ class ImageListView(QListView):
     def contextMenuEvent(self, event):
         self.context_menu.exec_(event.globalPos())
 
+    def paintEvent(self, event):
+        # Tell the image list model which images are visible before they are
+        # painted, so that it only loads the thumbnails of those images.
+        self.update_visible_image_range()
+        super().paintEvent(event)
+
+    def update_visible_image_range(self):
+        proxy_image_count = self.proxy_image_list_model.rowCount()
+        if proxy_image_count == 0:
+            return
+        viewport_rect = self.viewport().rect()
+        first_proxy_index = self.indexAt(viewport_rect.topLeft())
+        last_proxy_index = self.indexAt(viewport_rect.bottomLeft())
+        first_proxy_row = (first_proxy_index.row()
+                           if first_proxy_index.isValid() else 0)
+        # The last image can be above the bottom of the viewport.
+        last_proxy_row = (last_proxy_index.row()
+                          if last_proxy_index.isValid()
+                          else proxy_image_count - 1)
+        image_indices = [
+            self.proxy_image_list_model.mapToSource(
+                self.proxy_image_list_model.index(proxy_row, 0)).row()
+            for proxy_row in range(first_proxy_row, last_proxy_row + 1)]
+        self.proxy_image_list_model.sourceModel().set_visible_image_range(
+            min(image_indices), max(image_indices))
+
     @Slot()
     def invert_selection(self):
-        selected_proxy_rows = {index.row() for index in self.selectedIndexes()}
-        all_proxy_rows = set(range(self.proxy_image_list_model.rowCount()))
-        unselected_proxy_rows = all_proxy_rows - selected_proxy_rows
-        first_unselected_proxy_row = min(unselected_proxy_rows, default=0)
+        # Select the gaps between the selected ranges of rows, so that the
+        # work depends on the number of ranges instead of the number of rows.
+        selected_proxy_row_ranges = sorted(
+            (selection_range.top(), selection_range.bottom())
+            for selection_range in self.selectionModel().selection())
+        proxy_row_count = self.proxy_image_list_model.rowCount()
+        # Add an empty range after the last row to select the rows after the
+        # last selected range.
+        selected_proxy_row_ranges.append((proxy_row_count, proxy_row_count))
+        first_unselected_proxy_row = None
+        next_proxy_row = 0
         item_selection = QItemSelection()
-        for row in unselected_proxy_rows:
-            item_selection.append(
-                QItemSelectionRange(self.proxy_image_list_model.index(row, 0)))
+        for top_row, bottom_row in selected_proxy_row_ranges:
+            if top_row > next_proxy_row:
+                item_selection.append(QItemSelectionRange(
+                    self.proxy_image_list_model.index(next_proxy_row, 0),
+                    self.proxy_image_list_model.index(top_row - 1, 0)))
+                if first_unselected_proxy_row is None:
+                    first_unselected_proxy_row = next_proxy_row
+            next_proxy_row = max(next_proxy_row, bottom_row + 1)
+        if first_unselected_proxy_row is None:
+            first_unselected_proxy_row = 0
         self.setCurrentIndex(self.model().index(first_unselected_proxy_row, 0))
         self.selectionModel().select(
             item_selection, QItemSelectionModel.SelectionFlag.ClearAndSelect)
 
     def get_selected_images(self) -> list[Image]:
-        selected_image_proxy_indices = self.selectedIndexes()
-        selected_images = [index.data(Qt.UserRole)
-                           for index in selected_image_proxy_indices]
-        return selected_images
+        # The images are returned in the order in which they are displayed.
+        selected_image_proxy_rows = sorted(
+            {index.row() for index in self.selectedIndexes()})
+        return self.proxy_image_list_model.get_images_for_proxy_rows(
+            selected_image_proxy_rows)
 
     @Slot()
     def copy_selected_image_tags(self):
-        selected_images = self.get_selected_images()
-        selected_image_captions = [self.separator.join(image.tags)
-                                   for image in selected_images]
+        separator = self.separator
+        selected_image_captions = [separator.join(image.tags)
+                                   for image in self.get_selected_images()]
         QApplication.clipboard().setText('\n'.join(selected_image_captions))
 
     def get_selected_image_indices(self) -> list[QModelIndex]:
@@ -190,16 +350,40 @@ class ImageListView(QListView):
 
     @Slot()
     def copy_selected_image_file_names(self):
-        selected_images = self.get_selected_images()
-        selected_image_file_names = [image.path.name
-                                     for image in selected_images]
+        selected_image_paths = map(attrgetter('path'),
+                                   self.get_selected_images())
+        selected_image_file_names = [path.name
+                                     for path in selected_image_paths]
         QApplication.clipboard().setText('\n'.join(selected_image_file_names))
 
     @Slot()
     def copy_selected_image_paths(self):
-        selected_images = self.get_selected_images()
-        selected_image_paths = [str(image.path) for image in selected_images]
-        QApplication.clipboard().setText('\n'.join(selected_image_paths))
+        selected_image_paths = map(attrgetter('path'),
+                                   self.get_selected_images())
+        QApplication.clipboard().setText(
+            '\n'.join(map(str, selected_image_paths)))
+
+    def show_file_operation_error(self, operation: str,
+                                  failed_image_paths: list[Path],
+                                  directory_path: Path | None = None):
+        """Show a single error message for all of the failed images."""
+        failed_image_count = len(failed_image_paths)
+        if failed_image_count == 1:
+            text = f'Failed to {operation} {failed_image_paths[0]}'
+        else:
+            text = f'Failed to {operation} {failed_image_count} images'
+        if directory_path:
+            text += f' to {directory_path}'
+        text += '.'
+        error_message_box = QMessageBox(self)
+        error_message_box.setWindowTitle('Error')
+        error_message_box.setIcon(QMessageBox.Icon.Critical)
+        error_message_box.setText(text)
+        if failed_image_count > 1:
+            error_message_box.setDetailedText(
+                '\n'.join(str(image_path)
+                          for image_path in failed_image_paths))
+        error_message_box.exec()
 
     @Slot()
     def move_selected_images(self):
@@ -214,17 +398,18 @@ class ImageListView(QListView):
         if not move_directory_path:
             return
         move_directory_path = Path(move_directory_path)
-        for image in selected_images:
-            try:
-                image.path.replace(move_directory_path / image.path.name)
-                caption_file_path = image.path.with_suffix('.txt')
-                if caption_file_path.exists():
-                    caption_file_path.replace(
-                        move_directory_path / caption_file_path.name)
-            except OSError:
-                QMessageBox.critical(self, 'Error',
-                                     f'Failed to move {image.path} to '
-                                     f'{move_directory_path}.')
+        # Make sure that the caption files contain the latest tags.
+        self.proxy_image_list_model.sourceModel().wait_for_tag_writes()
+        # Only the first of the images with the same file names is moved.
+        images, failed_image_paths = split_duplicate_file_name_images(
+            selected_images)
+        failed_image_paths += get_failed_image_paths(
+            partial(move_image_and_caption_file,
+                    directory_path=move_directory_path),
+            images)
+        if failed_image_paths:
+            self.show_file_operation_error('move', failed_image_paths,
+                                           move_directory_path)
         self.directory_reload_requested.emit()
 
     @Slot()
@@ -240,16 +425,17 @@ class ImageListView(QListView):
         if not copy_directory_path:
             return
         copy_directory_path = Path(copy_directory_path)
-        for image in selected_images:
-            try:
-                shutil.copy(image.path, copy_directory_path)
-                caption_file_path = image.path.with_suffix('.txt')
-                if caption_file_path.exists():
-                    shutil.copy(caption_file_path, copy_directory_path)
-            except OSError:
-                QMessageBox.critical(self, 'Error',
-                                     f'Failed to copy {image.path} to '
-                                     f'{copy_directory_path}.')
+        self.proxy_image_list_model.sourceModel().wait_for_tag_writes()
+        # Only the first of the images with the same file names is copied.
+        images, failed_image_paths = split_duplicate_file_name_images(
+            selected_images)
+        failed_image_paths += get_failed_image_paths(
+            partial(copy_image_and_caption_file,
+                    directory_path=copy_directory_path),
+            images)
+        if failed_image_paths:
+            self.show_file_operation_error('copy', failed_image_paths,
+                                           copy_directory_path)
 
     @Slot()
     def delete_selected_images(self):
@@ -263,18 +449,14 @@ class ImageListView(QListView):
         reply = get_confirmation_dialog_reply(title, question)
         if reply != QMessageBox.StandardButton.Yes:
             return
-        for image in selected_images:
-            image_file = QFile(image.path)
-            if not image_file.moveToTrash():
-                QMessageBox.critical(self, 'Error',
-                                     f'Failed to delete {image.path}.')
-            caption_file_path = image.path.with_suffix('.txt')
-            caption_file = QFile(caption_file_path)
-            if caption_file.exists():
-                if not caption_file.moveToTrash():
-                    QMessageBox.critical(self, 'Error',
-                                         f'Failed to delete '
-                                         f'{caption_file_path}.')
+        self.proxy_image_list_model.sourceModel().wait_for_tag_writes()
+        # Moving files to the trash can be slow, especially on Windows, so
+        # the files are moved in parallel.
+        failed_image_paths = get_failed_image_paths(
+            move_image_and_caption_file_to_trash, selected_images,
+            initialize_com if sys.platform == 'win32' else None)
+        if failed_image_paths:
+            self.show_file_operation_error('delete', failed_image_paths)
         self.directory_reload_requested.emit()
 
     @Slot()
@@ -354,18 +536,28 @@ class ImageList(QDockWidget):
         Select the first image that has no tags, or the last image if all
         images are tagged.
         """
-        proxy_image_index = None
-        for proxy_image_index in range(self.proxy_image_list_model.rowCount()):
-            image: Image = self.proxy_image_list_model.data(
-                self.proxy_image_list_model.index(proxy_image_index, 0),
-                Qt.UserRole)
-            if not image.tags:
-                break
-        if proxy_image_index is None:
+        proxy_image_count = self.proxy_image_list_model.rowCount()
+        if proxy_image_count == 0:
             return
+        # Scan the source images directly instead of getting each image
+        # through the proxy model. The proxy model is not sorted, so the
+        # first untagged image that passes the filter is also the first one
+        # in the proxy model.
+        image_list_model = self.proxy_image_list_model.sourceModel()
+        proxy_image_index = self.proxy_image_list_model.index(
+            proxy_image_count - 1, 0)
+        for image_index, image in enumerate(image_list_model.images):
+            if image.tags:
+                continue
+            untagged_proxy_image_index = (
+                self.proxy_image_list_model.mapFromSource(
+                    image_list_model.index(image_index, 0)))
+            # The index is invalid if the image is filtered out.
+            if untagged_proxy_image_index.isValid():
+                proxy_image_index = untagged_proxy_image_index
+                break
         self.list_view.clearSelection()
-        self.list_view.setCurrentIndex(
-            self.proxy_image_list_model.index(proxy_image_index, 0))
+        self.list_view.setCurrentIndex(proxy_image_index)
 
     def get_selected_image_indices(self) -> list[QModelIndex]:
         return self.list_view.get_selected_image_indices()
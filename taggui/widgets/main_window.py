@@ -1,7 +1,7 @@
 from pathlib import Path
 
-from PySide6.QtCore import (QItemSelection, QKeyCombination, QModelIndex, QUrl,
-                            Qt, Slot)
+from PySide6.QtCore import (QItemSelection, QKeyCombination, QModelIndex,
+                            QTimer, QUrl, Qt, Slot)
 from PySide6.QtGui import (QAction, QCloseEvent, QDesktopServices, QIcon,
                            QKeySequence, QPixmap, QShortcut)
 from PySide6.QtWidgets import (QApplication, QFileDialog, QMainWindow,
@@ -31,6 +31,10 @@ from widgets.image_viewer import ImageViewer
 ICON_PATH = Path('images/icon.ico')
 GITHUB_REPOSITORY_URL = 'https://github.com/jhc13/taggui'
 TOKENIZER_DIRECTORY_PATH = Path('clip-vit-base-patch32')
+# The number of milliseconds to wait after the image list filter text is
+# changed before applying the filter, so that it is not applied after every
+# keystroke.
+IMAGE_LIST_FILTER_DELAY = 150
 
 
 class MainWindow(QMainWindow):
@@ -51,6 +55,13 @@ class MainWindow(QMainWindow):
             self.proxy_image_list_model)
         self.tag_counter_model = TagCounterModel()
         self.image_tag_list_model = ImageTagListModel()
+        # The index of the image to select once it has been loaded.
+        self.image_index_to_select: int | None = None
+        self.image_list_filter_timer = QTimer(self)
+        self.image_list_filter_timer.setSingleShot(True)
+        self.image_list_filter_timer.setInterval(IMAGE_LIST_FILTER_DELAY)
+        self.image_list_filter_timer.timeout.connect(
+            self.set_image_list_filter)
 
         self.setWindowIcon(QIcon(QPixmap(get_resource_path(ICON_PATH))))
         # Not setting this results in some ugly colors.
@@ -166,9 +177,17 @@ class MainWindow(QMainWindow):
         self.image_tags_editor.tag_input_box.setFocus()
 
     def closeEvent(self, event: QCloseEvent):
-        """Save the window geometry and state before closing."""
+        """
+        Save the window geometry and state and any unsaved caption settings,
+        and wait for the auto-captioner threads and for the tags to be
+        written before closing.
+        """
         self.settings.setValue('geometry', self.saveGeometry())
         self.settings.setValue('window_state', self.saveState())
+        self.auto_captioner.caption_settings_form.save_caption_settings()
+        self.auto_captioner.wait_for_threads()
+        self.image_list_model.stop_loading_directory()
+        self.image_list_model.wait_for_tag_writes()
         super().closeEvent(event)
 
     def set_font_size(self):
@@ -193,14 +212,14 @@ class MainWindow(QMainWindow):
     def load_directory(self, path: Path, select_index: int = 0):
         self.settings.setValue('directory_path', str(path))
         self.setWindowTitle(path.name)
+        # The images are loaded in the background, so the image is selected
+        # once it has been loaded.
+        self.image_index_to_select = select_index
         self.image_list_model.load_directory(path)
         self.image_list.filter_line_edit.clear()
+        # Apply the cleared filter immediately.
+        self.set_image_list_filter()
         self.all_tags_editor.filter_line_edit.clear()
-        # Clear the current index first to make sure that the `currentChanged`
-        # signal is emitted even if the image at the index is already selected.
-        self.image_list_selection_model.clearCurrentIndex()
-        self.image_list.list_view.setCurrentIndex(
-            self.proxy_image_list_model.index(select_index, 0))
         self.centralWidget().setCurrentWidget(self.image_viewer)
         self.reload_directory_action.setDisabled(False)
         self.image_tags_editor.tag_input_box.setDisabled(False)
@@ -229,12 +248,32 @@ class MainWindow(QMainWindow):
                             if self.proxy_image_list_model.filter is None
                             else 'filtered_image_index')
         select_index = self.settings.value(select_index_key, type=int) or 0
-        self.load_directory(Path(self.settings.value('directory_path')))
+        self.load_directory(Path(self.settings.value('directory_path')),
+                            select_index)
+        # The filter is applied to the images as they are loaded.
         self.image_list.filter_line_edit.setText(filter_text)
-        # If the selected image index is out of bounds due to images being
-        # deleted, select the last image.
+        self.set_image_list_filter()
+
+    @Slot()
+    def select_loaded_image(self):
+        """
+        Select the image that should be selected after loading a directory
+        once it has been loaded.
+        """
+        if self.image_index_to_select is None:
+            return
+        select_index = self.image_index_to_select
         if select_index >= self.proxy_image_list_model.rowCount():
+            if self.image_list_model.directory_load_thread is not None:
+                # Wait for more images to be loaded.
+                return
+            # If the selected image index is out of bounds due to images being
+            # deleted, select the last image.
             select_index = self.proxy_image_list_model.rowCount() - 1
+        self.image_index_to_select = None
+        # Clear the current index first to make sure that the `currentChanged`
+        # signal is emitted even if the image at the index is already selected.
+        self.image_list_selection_model.clearCurrentIndex()
         self.image_list.list_view.setCurrentIndex(
             self.proxy_image_list_model.index(select_index, 0))
 
@@ -299,6 +338,11 @@ class MainWindow(QMainWindow):
         settings_action.setShortcut(QKeySequence('Ctrl+Alt+S'))
         settings_action.triggered.connect(self.show_settings_dialog)
         file_menu.addAction(settings_action)
+        unload_captioning_model_action = QAction(
+            'Unload Auto-Captioning Model', parent=self)
+        unload_captioning_model_action.triggered.connect(
+            self.auto_captioner.unload_model)
+        file_menu.addAction(unload_captioning_model_action)
         exit_action = QAction('Exit', parent=self)
         exit_action.setShortcut(QKeySequence('Ctrl+W'))
         exit_action.triggered.connect(self.close)
@@ -379,6 +423,7 @@ class MainWindow(QMainWindow):
 
     @Slot()
     def set_image_list_filter(self):
+        self.image_list_filter_timer.stop()
         filter_ = self.image_list.filter_line_edit.parse_filter_text()
         self.proxy_image_list_model.filter = filter_
         # Apply the new filter.
@@ -408,8 +453,10 @@ class MainWindow(QMainWindow):
         self.settings.setValue(settings_key, proxy_image_index.row())
 
     def connect_image_list_signals(self):
+        # The timer is started in a lambda because `QTimer.start()` would
+        # otherwise use the text as the interval.
         self.image_list.filter_line_edit.textChanged.connect(
-            self.set_image_list_filter)
+            lambda: self.image_list_filter_timer.start())
         self.image_list_selection_model.currentChanged.connect(
             self.save_image_index)
         self.image_list_selection_model.currentChanged.connect(
@@ -421,11 +468,16 @@ class MainWindow(QMainWindow):
         self.image_list_model.modelReset.connect(
             lambda: self.tag_counter_model.count_tags(
                 self.image_list_model.images))
-        self.image_list_model.dataChanged.connect(
+        # The tags are counted once after all the images are loaded instead
+        # of after every batch.
+        self.image_list_model.directory_loaded.connect(
             lambda: self.tag_counter_model.count_tags(
                 self.image_list_model.images))
+        self.image_list_model.rowsInserted.connect(self.select_loaded_image)
+        self.image_list_model.directory_loaded.connect(
+            self.select_loaded_image)
         self.image_list_model.dataChanged.connect(
-            self.image_tags_editor.reload_image_tags_if_changed)
+            self.handle_image_list_model_data_change)
         self.image_list_model.update_undo_and_redo_actions_requested.connect(
             self.update_undo_and_redo_actions)
         # Rows are inserted or removed from the proxy image list model when the
@@ -446,6 +498,18 @@ class MainWindow(QMainWindow):
             lambda: self.toggle_image_list_action.setChecked(
                 self.image_list.isVisible()))
 
+    @Slot()
+    def handle_image_list_model_data_change(
+            self, first_changed_index: QModelIndex,
+            last_changed_index: QModelIndex, roles: list[int]):
+        # Thumbnail updates do not change the tags, so there is no need to
+        # count the tags or reload the image tags.
+        if roles and Qt.DisplayRole not in roles:
+            return
+        self.tag_counter_model.count_tags(self.image_list_model.images)
+        self.image_tags_editor.reload_image_tags_if_changed(
+            first_changed_index, last_changed_index)
+
     @Slot()
     def update_image_tags(self):
         image_index = self.image_tags_editor.image_index
@@ -502,6 +566,7 @@ class MainWindow(QMainWindow):
                                 .replace('"', r'\"').replace("'", r"\'"))
         self.image_list.filter_line_edit.setText(
             f'tag:"{escaped_selected_tag}"')
+        self.set_image_list_filter()
 
     def connect_all_tags_editor_signals(self):
         self.all_tags_editor.clear_filter_button.clicked.connect(
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# The application modules import each other relative to the `taggui`
+# directory.
+sys.path.insert(0, str(Path(__file__).parent.parent / 'taggui'))
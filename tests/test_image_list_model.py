@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide6.QtWidgets import QApplication
+
+from models.image_list_model import (ImageListModel,
+                                     get_image_paths_and_text_file_stems)
+from utils.thumbnail_loader import ThumbnailLoader
+
+
+class TestCancelThumbnailLoader(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        self.image_list_model = ImageListModel(image_list_image_width=64,
+                                               separator=', ')
+
+    def start_thumbnail_loader(self) -> tuple:
+        thumbnail_key = (Path('missing.png'), None, 64)
+        thumbnail_loader = ThumbnailLoader(
+            self.image_list_model.thumbnail_loader_signals, thumbnail_key,
+            0, Path('missing.png'), None, None, 64)
+        self.image_list_model.pending_thumbnail_loaders[thumbnail_key] = (
+            thumbnail_loader)
+        self.image_list_model.thumbnail_thread_pool.start(thumbnail_loader)
+        return thumbnail_key
+
+    def test_cancel_finished_thumbnail_loader(self):
+        # The loader stays pending until its queued `thumbnail_loaded` signal
+        # is processed, after the thread pool has deleted it.
+        thumbnail_key = self.start_thumbnail_loader()
+        self.image_list_model.thumbnail_thread_pool.waitForDone()
+        self.image_list_model.cancel_thumbnail_loader(thumbnail_key)
+        self.assertNotIn(thumbnail_key,
+                         self.image_list_model.pending_thumbnail_loaders)
+
+    def test_load_directory_with_finished_thumbnail_loader(self):
+        self.start_thumbnail_loader()
+        self.image_list_model.thumbnail_thread_pool.waitForDone()
+        model_reset_count = 0
+
+        def count_model_reset():
+            nonlocal model_reset_count
+            model_reset_count += 1
+
+        self.image_list_model.modelReset.connect(count_model_reset)
+        self.image_list_model.load_directory(Path(__file__).parent)
+        self.image_list_model.stop_loading_directory()
+        self.assertEqual(model_reset_count, 1)
+        self.assertFalse(self.image_list_model.pending_thumbnail_loaders)
+
+
+class TestGetImagePathsAndTextFileStems(unittest.TestCase):
+    def test_only_readable_image_formats_are_loaded(self):
+        with tempfile.TemporaryDirectory() as directory_path_string:
+            directory_path = Path(directory_path_string)
+            (directory_path / 'subdirectory').mkdir()
+            file_names = ['a.PNG', 'b.jfif', 'subdirectory/c.ppm', 'd.xpm',
+                          'a.txt', 'e.txt.tmp', 'f.json', 'README.md',
+                          '.DS_Store', '._g.png']
+            for file_name in file_names:
+                (directory_path / file_name).touch()
+            image_paths, text_file_stems = (
+                get_image_paths_and_text_file_stems(directory_path))
+        self.assertEqual(
+            sorted(image_path.relative_to(directory_path).as_posix()
+                   for image_path in image_paths),
+            ['a.PNG', 'b.jfif', 'd.xpm', 'subdirectory/c.ppm'])
+        self.assertEqual(text_file_stems, {str(directory_path / 'a')})
+
+
+if __name__ == '__main__':
+    unittest.main()